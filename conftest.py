@@ -0,0 +1 @@
+# 让 tests/ 中的测试可以直接导入仓库根目录下的模块
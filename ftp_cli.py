@@ -0,0 +1,446 @@
+import argparse
+import contextlib
+import fnmatch
+import glob
+import json
+import os
+import posixpath
+import queue
+import sys
+import threading
+import time
+
+# 只依赖后端模块和标准库，不加载 PyQt，适合在定时任务中快速启动
+from ftp_client import FTPClient, FXPTransfer, TransferJournal, TransportConfig
+
+
+def has_magic(pattern: str) -> bool:
+    return any(c in pattern for c in "*?[")
+
+
+def tls_context(args):
+    if not args.tls:
+        return None
+    import ssl
+
+    context = ssl.create_default_context(cafile=args.ca_file)
+    if args.insecure:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def connect(args) -> FTPClient:
+    client = FTPClient(
+        args.host,
+        args.port,
+        mode="active" if args.active else "passive",
+        keepalive_interval=None,
+        transport=TransportConfig(
+            connect_timeout=args.connect_timeout,
+            idle_timeout=args.idle_timeout,
+            bandwidth=args.bandwidth * 1e6 / 8,
+            disk_buffers=args.disk_buffers,
+            preallocate=args.preallocate,
+        ),
+        tls=args.tls,
+        ssl_context=tls_context(args),
+    )
+    client.login(args.user, args.password)
+    # 批处理任务按字节传输，传输后才能用大小校验结果
+    client.set_transfer_mode("binary")
+    return client
+
+
+def expand_remote(
+    client: FTPClient, patterns: list, listings: dict | None = None
+) -> tuple[list, list]:
+    # 展开远程路径中最后一级的通配符，返回 [(路径, 条目)] 和 [(模式, 错误)]。
+    # listings 为 目录 -> 条目列表（或列出时的异常），可在多次调用间共用
+    matches = []
+    failures = []
+    listings = {} if listings is None else listings
+    for pattern in patterns:
+        pattern = pattern.rstrip("/") or "/"
+        directory, name = posixpath.split(pattern)
+        directory = directory or "."
+        if directory not in listings:
+            try:
+                listings[directory] = client.list_entries(directory)
+            except Exception as e:
+                listings[directory] = e  # 后端用 Exception 报告服务器错误（如 550）
+        if isinstance(listings[directory], Exception):
+            failures.append((pattern, str(listings[directory])))
+            continue
+        found = [
+            (posixpath.join(directory, entry[6]) if directory != "." else entry[6], entry)
+            for entry in listings[directory]
+            if (fnmatch.fnmatchcase(entry[6], name) if has_magic(name) else entry[6] == name)
+        ]
+        if found:
+            matches.extend(found)
+        else:
+            failures.append((pattern, "no match"))
+    return matches, failures
+
+
+def is_remote_dir(client: FTPClient, path: str, listings: dict) -> bool:
+    # 按父目录列表中的权限位判断，列不出或不存在时视为非目录
+    if path.endswith("/") or posixpath.basename(path) in ("", ".", ".."):
+        return True
+    matches, _ = expand_remote(client, [path], listings)
+    return bool(matches) and matches[0][1][0].startswith("d")
+
+
+def walk_remote(
+    client: FTPClient, remote_dir: str, local_dir: str, tasks: list, failures: list
+):
+    # 递归收集远程目录下的文件，类型取自列表中的权限位；
+    # 列不出的目录作为失败结果加入 failures，不中断其他目录
+    if client.journal and client.journal.is_done("get-dir", remote_dir, local_dir):
+        return  # 上次运行已完成整个目录，不再列出
+    try:
+        entries = client.list_entries(remote_dir)
+    except Exception as e:
+        failures.append(
+            {"source": remote_dir, "target": local_dir, "status": "failed", "error": str(e)}
+        )
+        return
+    os.makedirs(local_dir, exist_ok=True)
+    for entry in entries:
+        name = entry[6]
+        remote_path = posixpath.join(remote_dir, name)
+        local_path = os.path.join(local_dir, name)
+        if entry[0].startswith("d"):
+            walk_remote(client, remote_path, local_path, tasks, failures)
+        else:
+            tasks.append((remote_path, local_path, entry[4]))
+
+
+def run_parallel(client: FTPClient, jobs: int, tasks: list, worker) -> list:
+    # 用 jobs 个会话并行执行任务，每个线程独占一个会话
+    results = []
+    results_lock = threading.Lock()
+    pending = queue.Queue()
+    for task in tasks:
+        pending.put(task)
+
+    def run(session):
+        try:
+            while True:
+                try:
+                    task = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    result = worker(session, task)
+                except Exception as e:
+                    result = {"source": task[0], "status": "failed", "error": str(e)}
+                with results_lock:
+                    results.append(result)
+        finally:
+            if session is not client:
+                session.quit()
+
+    sessions = [client]
+    for _ in range(min(jobs, len(tasks)) - 1):
+        sessions.append(client.clone())
+    threads = [threading.Thread(target=run, args=(session,)) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def download_task(session: FTPClient, task) -> dict:
+    remote_path, local_path, size = task
+    result = {"source": remote_path, "target": local_path, "bytes": size}
+    journal = session.journal
+    if journal and journal.is_done("get", remote_path, local_path):
+        result["status"] = "skipped"
+        return result
+    if os.path.exists(local_path) and os.path.getsize(local_path) == size:
+        result["status"] = "skipped"
+        if journal:
+            journal.record_done("get", remote_path, local_path, size=size)
+        return result
+    os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+    session.download(remote_path, local_path, is_dir=False)
+    # download 内部只打印错误，这里用大小确认是否完整
+    local_size = os.path.getsize(local_path) if os.path.exists(local_path) else -1
+    result["status"] = "ok" if local_size == size else "failed"
+    if local_size != size:
+        result["error"] = f"local size {local_size} != remote size {size}"
+    return result
+
+
+def upload_task(session: FTPClient, task) -> dict:
+    local_path, remote_path, size = task
+    result = {"source": local_path, "target": remote_path, "bytes": size}
+    if session.journal and session.journal.is_done("put", local_path, remote_path):
+        result["status"] = "skipped"
+        return result
+    result["status"] = "ok" if session.upload(local_path, remote_path) else "failed"
+    return result
+
+
+def record_finished_dirs(client: FTPClient, kind: str, dirs: list, results: list):
+    # 全部文件都成功时把顶层目录记为完成，重新运行时整棵树直接跳过
+    if client.journal and not any(r["status"] == "failed" for r in results):
+        for source, target in dirs:
+            client.journal.record_done(kind, source, target)
+
+
+def verify_uploads(client: FTPClient, results: list):
+    # 每个目标目录只列一次，按大小确认上传结果
+    listings = {}
+    for result in results:
+        if result["status"] != "ok":
+            continue
+        directory, name = posixpath.split(result["target"])
+        directory = directory or "."
+        if directory not in listings:
+            listings[directory] = {e[6]: e[4] for e in client.list_entries(directory)}
+        remote_size = listings[directory].get(name, -1)
+        if remote_size != result["bytes"]:
+            result["status"] = "failed"
+            result["error"] = f"remote size {remote_size} != local size {result['bytes']}"
+
+
+def cmd_ls(client: FTPClient, args) -> list:
+    # 目录列出其内容；文件和通配符列出匹配的条目本身
+    listings = {}
+    patterns = []
+    for path in args.paths or ["."]:
+        if not has_magic(path) and is_remote_dir(client, path, listings):
+            path = posixpath.join(path, "*")
+        patterns.append(path)
+    matches, failures = expand_remote(client, patterns, listings)
+    results = [
+        {
+            "path": path,
+            "type": "dir" if entry[0].startswith("d") else "file",
+            "size": entry[4],
+            "modified": entry[5],
+            "permissions": entry[0],
+        }
+        for path, entry in matches
+    ]
+    results.extend({"path": p, "status": "failed", "error": error} for p, error in failures)
+    return results
+
+
+def cmd_get(client: FTPClient, args) -> list:
+    matches, failures = expand_remote(client, args.remote)
+    tasks = []
+    dirs = []
+    walk_failures = []
+    for path, entry in matches:
+        local_path = os.path.join(args.output, posixpath.basename(path))
+        if entry[0].startswith("d"):
+            walk_remote(client, path, local_path, tasks, walk_failures)
+            dirs.append((path, local_path))
+        else:
+            tasks.append((path, local_path, entry[4]))
+    results = run_parallel(client, args.jobs, tasks, download_task) + walk_failures
+    record_finished_dirs(client, "get-dir", dirs, results)
+    results.extend({"source": p, "status": "failed", "error": error} for p, error in failures)
+    return results
+
+
+def cmd_mirror(client: FTPClient, args) -> list:
+    tasks = []
+    failures = []
+    walk_remote(client, args.remote_dir, args.local_dir, tasks, failures)
+    results = run_parallel(client, args.jobs, tasks, download_task) + failures
+    record_finished_dirs(client, "get-dir", [(args.remote_dir, args.local_dir)], results)
+    return results
+
+
+def cmd_put(client: FTPClient, args) -> list:
+    tasks = []
+    dirs = []
+    missing = []
+    for pattern in args.local:
+        paths = glob.glob(pattern) if has_magic(pattern) else [pattern]
+        paths = [p for p in paths if os.path.exists(p)]
+        if not paths:
+            missing.append(pattern)
+        for path in paths:
+            base = posixpath.join(args.remote_dir, os.path.basename(path.rstrip(os.sep)))
+            if not os.path.isdir(path):
+                tasks.append((path, base, os.path.getsize(path)))
+                continue
+            if client.journal and client.journal.is_done("put-dir", path, base):
+                continue
+            dirs.append((path, base))
+            # 目录先按层级顺序创建，文件再并行上传
+            for dirpath, _, filenames in os.walk(path):
+                relative = os.path.relpath(dirpath, path)
+                remote_dir = base if relative == "." else posixpath.join(
+                    base, *relative.split(os.sep)
+                )
+                client.mkdir(remote_dir)
+                for filename in filenames:
+                    local_path = os.path.join(dirpath, filename)
+                    tasks.append(
+                        (local_path, posixpath.join(remote_dir, filename), os.path.getsize(local_path))
+                    )
+    results = run_parallel(client, args.jobs, tasks, upload_task)
+    verify_uploads(client, results)
+    record_finished_dirs(client, "put-dir", dirs, results)
+    results.extend({"source": p, "status": "failed", "error": "no match"} for p in missing)
+    return results
+
+
+def cmd_fxp(client: FTPClient, args) -> list:
+    # 源服务器为 --host，目标服务器为 --to-host，数据在两台服务器之间直接传输
+    target = FTPClient(
+        args.to_host,
+        args.to_port,
+        keepalive_interval=None,
+        transport=client.transport,
+        tls=client.tls,
+        ssl_context=client.ssl_context,
+    )
+    target.login(args.to_user, args.to_password)
+    try:
+        matches, failures = expand_remote(client, args.remote)
+
+        def on_progress(path, file_done, file_size, total_done, total_size):
+            print(f"{path}: {file_done}/{file_size} bytes, total {total_done}/{total_size}")
+
+        transfer = FXPTransfer(client, target, on_progress=on_progress)
+        for path, entry in matches:
+            target_path = posixpath.join(args.target_dir, posixpath.basename(path))
+            transfer.run(path, target_path, is_dir=entry[0].startswith("d"))
+    finally:
+        target.quit()
+    transfer.results.extend(
+        {"source": p, "status": "failed", "error": error} for p, error in failures
+    )
+    return transfer.results
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ftp_cli", description="FTP 批处理命令行：ls / get / put / mirror / fxp"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=21)
+    parser.add_argument("--user", default="anonymous")
+    parser.add_argument("--password", default="anonymous@")
+    parser.add_argument("--active", action="store_true", help="使用主动模式")
+    parser.add_argument(
+        "--tls", action="store_true", help="使用显式 FTPS（AUTH TLS），控制和数据连接都加密"
+    )
+    parser.add_argument("--ca-file", help="校验服务器证书用的 CA 证书文件（如自签名证书）")
+    parser.add_argument("--insecure", action="store_true", help="不校验服务器证书")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="并行会话数")
+    parser.add_argument("--connect-timeout", type=float, default=15.0, help="建立连接的超时秒数")
+    parser.add_argument(
+        "--idle-timeout", type=float, default=120.0, help="等待应答或数据的超时秒数，超时后重连续传"
+    )
+    parser.add_argument(
+        "--bandwidth", type=float, default=100.0, help="预计带宽（Mbit/s），用于计算数据连接缓冲区"
+    )
+    parser.add_argument(
+        "--disk-buffers", type=int, default=4, help="磁盘读写与网络收发之间的缓冲区个数，0 表示不重叠"
+    )
+    parser.add_argument(
+        "--preallocate", action="store_true", help="下载前按远程大小预分配本地文件（先写入 .part，完成后改名）"
+    )
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    parser.add_argument("-v", "--verbose", action="store_true", help="把服务器应答输出到 stderr")
+    parser.add_argument(
+        "--journal", help="检查点日志文件；任务中断后用同一文件重新运行可跳过已完成的部分"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ls = commands.add_parser("ls", help="列出远程文件，支持通配符")
+    ls.add_argument("paths", nargs="*")
+    ls.set_defaults(func=cmd_ls)
+
+    get = commands.add_parser("get", help="下载远程文件或目录，支持通配符")
+    get.add_argument("remote", nargs="+")
+    get.add_argument("-o", "--output", default=".", help="本地目标目录")
+    get.set_defaults(func=cmd_get)
+
+    put = commands.add_parser("put", help="上传本地文件或目录，支持通配符")
+    put.add_argument("local", nargs="+")
+    put.add_argument("-d", "--remote-dir", default=".", help="远程目标目录")
+    put.set_defaults(func=cmd_put)
+
+    mirror = commands.add_parser("mirror", help="把远程目录树同步到本地，跳过大小一致的文件")
+    mirror.add_argument("remote_dir")
+    mirror.add_argument("local_dir")
+    mirror.set_defaults(func=cmd_mirror)
+
+    fxp = commands.add_parser("fxp", help="在两台服务器之间直接传输文件或目录（FXP），不经过本机")
+    fxp.add_argument("remote", nargs="+", help="源服务器上的路径，支持通配符")
+    fxp.add_argument("--to-host", required=True)
+    fxp.add_argument("--to-port", type=int, default=21)
+    fxp.add_argument("--to-user", default="anonymous")
+    fxp.add_argument("--to-password", default="anonymous@")
+    fxp.add_argument("-d", "--target-dir", default=".", help="目标服务器上的目录")
+    fxp.set_defaults(func=cmd_fxp)
+    return parser
+
+
+def print_results(args, results: list, elapsed: float, tuning: dict):
+    failed = sum(1 for r in results if r.get("status") == "failed")
+    if args.json:
+        summary = {
+            "command": args.command,
+            "results": results,
+            "failed": failed,
+            "elapsed": round(elapsed, 3),
+            "transport": tuning,
+        }
+        json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+        return
+    for r in results:
+        if args.command == "ls" and "status" not in r:
+            print(f"{r['permissions']} {r['size']:>12} {r['modified']:<16} {r['path']}")
+        elif "target" in r:
+            print(f"{r['status']:<8} {r['source']} -> {r['target']}")
+        else:
+            print(f"{r['status']:<8} {r['source'] if 'source' in r else r['path']}")
+        if r.get("error"):
+            print(f"         {r['error']}")
+    if args.command != "ls":
+        print(f"{len(results)} items, {failed} failed, {elapsed:.2f}s")
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    start = time.monotonic()
+    # 后端会打印每条服务器应答，批处理时不能混入结果输出
+    chatter = sys.stderr if args.verbose else open(os.devnull, "w")
+    try:
+        with contextlib.redirect_stdout(chatter):
+            client = connect(args)
+            if args.journal:
+                client.journal = TransferJournal(args.journal)
+            try:
+                results = args.func(client, args)
+                print(f"Transport tuning: {client.tuning_report()}")
+            finally:
+                client.quit()
+                if client.journal:
+                    client.journal.close()
+    except Exception as e:
+        # 连接失败，或后端以 Exception 报告的服务器错误
+        print(f"ftp_cli: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if chatter is not sys.stderr:
+            chatter.close()
+    print_results(args, results, time.monotonic() - start, client.tuning)
+    return 1 if any(r.get("status") == "failed" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
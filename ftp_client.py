@@ -1,7 +1,413 @@
 import socket
 import time
 import os
+import posixpath
+import threading
+import functools
 import traceback
+import fnmatch
+import hashlib
+import io
+import json
+import queue
+import re
+import select
+import ipaddress
+import struct
+from collections import OrderedDict
+from datetime import datetime
+
+from ftp_listing import parse_listing, parse_mod_time
+
+
+class TransferJournal:
+    # 多文件任务的检查点日志：只追加的 JSON 行文件，记录已完成的文件（含大小和
+    # sha256）、下载中途已落盘的偏移量以及已完成的目录。写入按批次 fsync；
+    # 重新运行同一任务时据此跳过已完成的工作，无需再询问服务器。
+    # 每条记录以 (类型, 源, 目标) 为键，后写的记录覆盖先写的。
+
+    def __init__(
+        self,
+        path: str,
+        sync_every: int = 256,
+        sync_interval: float = 1.0,
+        checkpoint_bytes: int = 8 * 1024 * 1024,
+        verify_digests: bool = False,
+    ):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.checkpoint_bytes = checkpoint_bytes  # 下载时每传输这么多字节记录一次偏移
+        self.verify_digests = verify_digests
+        self.records = {}
+        self.lock = threading.Lock()
+        self._unsynced = []  # 已写入但尚未 fsync 的记录
+        self._files_to_sync = []  # 完成记录生效前必须先落盘的本地文件
+        self._last_sync = time.monotonic()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 崩溃时写了一半的最后一行
+                    self.records[self._key(record)] = record
+        torn = False
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        self.f = open(path, "a", encoding="utf-8")
+        if torn:
+            # 上次崩溃时最后一行只写了一半：先换行，新记录不能接在残片后面
+            self.f.write("\n")
+            self.f.flush()
+
+    @staticmethod
+    def _key(record) -> tuple:
+        return record["kind"], record["source"], record["target"]
+
+    def is_done(self, kind: str, source: str, target: str) -> bool:
+        record = self.records.get((kind, source, target))
+        if record is None or record["op"] != "done":
+            return False
+        if kind == "get":
+            # 本地文件被删除或改动时重新下载
+            if not os.path.exists(target) or os.path.getsize(target) != record["size"]:
+                return False
+            if self.verify_digests and record.get("sha256"):
+                return file_digest(target) == record["sha256"]
+        elif kind == "put":
+            # 本地源文件在两次运行之间被改动时重新上传
+            try:
+                stat = os.stat(source)
+            except OSError:
+                return False
+            if stat.st_size != record.get("size") or stat.st_mtime_ns != record.get("mtime"):
+                return False
+            if self.verify_digests and record.get("sha256"):
+                return file_digest(source) == record["sha256"]
+        elif kind == "put-dir":
+            # 目录中任何文件增删或改动都会改变指纹，此时逐个文件按 put 记录判断
+            return record.get("tree") == _tree_fingerprint(source)
+        elif kind == "get-dir":
+            # 本地目录中的文件被删除或改动时，逐个文件按 get 记录判断
+            return record.get("tree") == _tree_fingerprint(target)
+        return True
+
+    def offset(self, kind: str, source: str, target: str) -> int | None:
+        record = self.records.get((kind, source, target))
+        if record is None or record["op"] != "partial":
+            return None
+        return record["offset"]
+
+    def record_partial(self, kind: str, source: str, target: str, offset: int):
+        # 调用者必须先 fsync 数据文件，偏移量才可信
+        self._append({"op": "partial", "kind": kind, "source": source,
+                      "target": target, "offset": offset})
+
+    def record_done(
+        self,
+        kind: str,
+        source: str,
+        target: str,
+        size: int | None = None,
+        digest: str | None = None,
+        sync_path: str | None = None,
+    ):
+        # sync_path 为下载得到的本地文件，在记录落盘前一并 fsync
+        record = {"op": "done", "kind": kind, "source": source, "target": target}
+        if size is not None:
+            record["size"] = size
+        if kind == "put":
+            record["mtime"] = os.stat(source).st_mtime_ns
+        elif kind == "put-dir":
+            record["tree"] = _tree_fingerprint(source)
+        elif kind == "get-dir":
+            record["tree"] = _tree_fingerprint(target)
+        if digest is not None:
+            record["sha256"] = digest
+        self._append(record, sync_path)
+
+    def _append(self, record, sync_path: str | None = None):
+        with self.lock:
+            self.records[self._key(record)] = record
+            self._unsynced.append(json.dumps(record, ensure_ascii=False))
+            if sync_path:
+                self._files_to_sync.append(sync_path)
+            if (
+                len(self._unsynced) >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_interval
+            ):
+                self._sync()
+
+    def _sync(self):
+        # 只 fsync 本批完成的文件；os.sync() 会冲刷整台主机的脏页，包括进行中的大文件下载
+        for path in self._files_to_sync:
+            try:
+                fd = os.open(path, os.O_RDONLY)  # 只读的文件也能 fsync
+            except OSError:
+                continue  # 文件已被移走，记录不再有意义
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self._files_to_sync = []
+        if self._unsynced:
+            self.f.write("\n".join(self._unsynced) + "\n")
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self._unsynced = []
+        self._last_sync = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self._sync()
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _tree_fingerprint(path: str) -> list:
+    # 目录树的 [文件数, 总字节数, 最新修改时间]，用于判断传输过的本地目录是否有变化
+    count = total = newest = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                stat = os.stat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            count += 1
+            total += stat.st_size
+            newest = max(newest, stat.st_mtime_ns)
+    return [count, total, newest]
+
+
+def file_digest(path: str, length: int | None = None) -> str:
+    # 计算本地文件（或其前 length 字节）的 sha256
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        update_digest(digest, f, length)
+    return digest.hexdigest()
+
+
+def update_digest(digest, f, length: int | None = None):
+    # 从 f 的当前位置读取（至多 length 字节）计入摘要
+    remaining = length
+    while remaining is None or remaining > 0:
+        chunk = f.read(1024 * 1024 if remaining is None else min(remaining, 1024 * 1024))
+        if not chunk:
+            break
+        digest.update(chunk)
+        if remaining is not None:
+            remaining -= len(chunk)
+
+
+class TransportConfig:
+    # 控制连接和数据连接的套接字参数。控制连接命令短而频繁，关闭 Nagle 算法；
+    # 数据连接的收发缓冲区按带宽时延积（带宽 × RTT）设置，RTT 在建立控制连接时测得。
+    # 超时：connect_timeout 用于建立连接，idle_timeout 为等待应答或数据的最长时间，
+    # 超时后由 _supervised 重连并续传，而不是永远挂起。None 表示不限时。
+
+    def __init__(
+        self,
+        connect_timeout: float | None = 15.0,
+        idle_timeout: float | None = 120.0,
+        nodelay: bool = True,
+        bandwidth: float = 100e6 / 8,
+        min_buffer: int = 64 * 1024,
+        max_buffer: int = 16 * 1024 * 1024,
+        io_size: int = 64 * 1024,
+        disk_buffers: int = 4,
+        preallocate: bool = False,
+    ):
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.nodelay = nodelay
+        self.bandwidth = bandwidth  # 预计的链路带宽，字节/秒
+        self.min_buffer = min_buffer
+        self.max_buffer = max_buffer
+        self.io_size = io_size  # 数据连接每次收发的字节数
+        # 本地文件读写在独立线程中进行，与网络收发重叠；disk_buffers 为两者之间循环使用的
+        # 缓冲区个数（每个 io_size 字节），0 表示在收发线程中同步读写
+        self.disk_buffers = disk_buffers
+        self.preallocate = preallocate  # 下载前按远程大小预分配本地文件，减少碎片
+
+    def buffer_size(self, rtt: float | None) -> int:
+        if rtt is None:
+            return self.min_buffer
+        return int(min(self.max_buffer, max(self.min_buffer, self.bandwidth * rtt)))
+
+
+def measure_rtt(sock: socket.socket, connect_time: float) -> float:
+    # Linux 上读取内核在握手时测得的 RTT（struct tcp_info 的 tcpi_rtt，微秒），
+    # 其他平台用 connect() 的耗时近似，三次握手正好一个往返
+    if hasattr(socket, "TCP_INFO"):
+        try:
+            info = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, 104)
+            rtt_us = struct.unpack_from("I", info, 68)[0]
+            if rtt_us > 0:
+                return rtt_us / 1e6
+        except (OSError, struct.error):
+            pass
+    return connect_time
+
+
+class _BufferRing:
+    # 磁盘线程与收发线程之间的缓冲区环：free 队列存放空闲缓冲区，full 队列存放
+    # (缓冲区, 长度) 待对方处理。缓冲区都在使用中时生产方阻塞，内存以 buffers × io_size
+    # 为上限，且缓冲区循环使用，传输过程中不再分配内存。buffers 为 0 时不启动线程，
+    # 只用一个缓冲区在调用线程中同步读写。
+
+    def __init__(self, f, buffers: int, io_size: int):
+        self.f = f
+        self.error = None
+        self.free = queue.Queue()
+        self.full = queue.Queue()
+        for _ in range(max(buffers, 1)):
+            self.free.put(bytearray(io_size))
+        self.thread = None
+        if buffers > 0:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+
+class DiskWriter(_BufferRing):
+    # 下载：收发线程把数据 recv_into 到空闲缓冲区后提交，写线程按顺序写入文件。
+    # on_written(data) 在写入后于写线程中调用，用于摘要和检查点
+    # （检查点的 fsync 因此也不会阻塞接收）
+
+    def __init__(self, f, buffers: int, io_size: int, on_written=None):
+        self.on_written = on_written
+        super().__init__(f, buffers, io_size)
+
+    def acquire(self) -> bytearray:
+        buf = self.free.get()
+        if self.error is not None:
+            raise self.error
+        return buf
+
+    def release(self, buf: bytearray):
+        self.free.put(buf)
+
+    def submit(self, buf: bytearray, length: int):
+        if self.thread is None:
+            self._write(buf, length)
+            self.free.put(buf)
+        else:
+            self.full.put((buf, length))
+
+    def _write(self, buf: bytearray, length: int):
+        data = memoryview(buf)[:length]
+        self.f.write(data)
+        if self.on_written:
+            self.on_written(data)
+
+    def _run(self):
+        while True:
+            item = self.full.get()
+            if item is None:
+                break
+            buf, length = item
+            if self.error is None:  # 出错后只回收缓冲区，让收发线程在 acquire 时看到错误
+                try:
+                    self._write(buf, length)
+                except Exception as e:
+                    self.error = e
+            self.free.put(buf)
+
+    def close(self):
+        # 等待已提交的数据全部写入；写入失败时抛出
+        if self.thread is not None:
+            self.full.put(None)
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            raise self.error
+
+
+class DiskReader(_BufferRing):
+    # 上传：读线程提前把文件读入空闲缓冲区，收发线程迭代得到数据块发送。
+    # 每个数据块在取下一块时归还，因此发送完成前不能保留它
+
+    def __iter__(self):
+        while True:
+            if self.thread is None:
+                buf = self.free.get()
+                length = self.f.readinto(buf)
+            else:
+                buf, length = self.full.get()
+                if self.error is not None:
+                    raise self.error
+            if not length:
+                self.free.put(buf)
+                return
+            yield memoryview(buf)[:length]
+            self.free.put(buf)
+
+    def _run(self):
+        while True:
+            buf = self.free.get()
+            if buf is None:
+                break
+            try:
+                length = self.f.readinto(buf)
+            except Exception as e:
+                self.error = e
+                length = 0
+            self.full.put((buf, length))
+            if not length:
+                break
+
+    def close(self):
+        # 提前结束（发送失败）时让读线程退出
+        if self.thread is not None:
+            self.free.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+def preallocate_file(f, size: int):
+    # 为下载预留磁盘空间（文件大小随之变为 size），减少碎片并提前发现空间不足；
+    # 不支持的平台或文件系统上静默跳过
+    if size <= 0 or not hasattr(os, "posix_fallocate"):
+        return False
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+        return True
+    except OSError:
+        return False
+
+
+def _supervised(method):
+    # 在会话锁内执行控制连接上的操作；若连接被空闲超时或 NAT 断开，
+    # 自动重连并恢复会话后重试。传输中断的文件在重试时通过 REST 续传。
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        attempt = 0
+        while True:
+            with self.lock:
+                try:
+                    return method(self, *args, **kwargs)
+                except (ConnectionError, socket.timeout) as e:
+                    if attempt >= self.max_reconnects:
+                        self._set_connected(False, f"连接已断开: {e}")
+                        raise
+                    attempt += 1
+                    print(
+                        f"Connection lost ({e}). Reconnecting... ({attempt}/{self.max_reconnects})"
+                    )
+                    self.reconnect()
+
+    return wrapper
 
 
 class FTPClient:
@@ -12,15 +418,246 @@ class FTPClient:
         mode="passive",
         transfer_mode="ascii",
         transfer_method="stream",
+        keepalive_interval: float | None = 30.0,
+        max_reconnects: int = 3,
+        transport: TransportConfig | None = None,
+        stat_listing: bool = True,
+        stat_max_entries: int = 1000,
+        tls: bool = False,
+        ssl_context=None,
     ):
         self.ip = ip
         self.port = port
         self.mode = mode
         self.transfer_mode = transfer_mode
         self.transfer_method = transfer_method
-        self.s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.s.connect((ip, port))
+        # 会话状态，断线重连后据此恢复（登录、当前目录、TYPE、MODE）
+        self.username = None
+        self.password = None
+        self.cwd = None
+        self.keepalive_interval = keepalive_interval
+        self.max_reconnects = max_reconnects
+        self.on_state_change = None  # 可选回调 (connected: bool, message: str)
+        self.journal = None  # 可选的 TransferJournal，用于多文件任务的断点记录
+        self.transport = transport or TransportConfig()
+        self.rtt = None  # 控制连接测得的往返时间，秒
+        self.tuning = {}  # 实际采用的套接字参数，见 tuning_report()
+        # 用 STAT <路径> 在控制连接上取目录列表，省去数据连接。None 表示尚未确认服务器支持；
+        # 条目超过 stat_max_entries 的目录记入 _large_dirs，之后改走数据连接
+        self.stat_listing = None if stat_listing else False
+        self.stat_max_entries = stat_max_entries
+        self._large_dirs = set()
+        # 显式 FTPS：控制连接用 AUTH TLS 升级，数据连接用 PROT P 加密并复用控制连接的
+        # TLS 会话。ssl_context 为 None 时使用系统默认的证书校验
+        self.tls = tls
+        self.ssl_context = ssl_context
+        self.tls_stats = {
+            "tls_version": None,
+            "tls_full_handshakes": 0,
+            "tls_resumed_handshakes": 0,
+            "tls_full_ms": 0.0,
+            "tls_resumed_ms": 0.0,
+        }
+        self.connected = False
+        self._open_stream = None  # 尚未关闭的 RetrStream，期间数据连接被它占用
+        self.lock = threading.RLock()
+        self.last_activity = time.monotonic()
+        self._keepalive_stop = threading.Event()
+        self._keepalive_thread = None
+        self.connect()
+
+    def connect(self):
+        transport = self.transport
+        start = time.monotonic()
+        self.s = socket.create_connection((self.ip, self.port), timeout=transport.connect_timeout)
+        self.rtt = measure_rtt(self.s, time.monotonic() - start)
+        self.s.settimeout(transport.idle_timeout)
+        if transport.nodelay:
+            self.s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.tuning = {
+            "rtt_ms": round(self.rtt * 1000, 3),
+            "nodelay": transport.nodelay,
+            "connect_timeout": transport.connect_timeout,
+            "idle_timeout": transport.idle_timeout,
+            "bandwidth": transport.bandwidth,
+            "bdp": int(transport.bandwidth * self.rtt),
+        }
+        if self.tls:
+            self.tuning.update(self.tls_stats)
+        self._recv_buffer = b""
         print(self.control_recv_all())
+        if self.tls:
+            self._start_tls()
+        self.connected = True
+
+    def _start_tls(self):
+        import ssl  # 只有启用 TLS 时才加载，命令行工具的启动不受影响
+
+        if self.ssl_context is None:
+            self.ssl_context = ssl.create_default_context()
+        self.send_cmd("AUTH TLS")
+        response = self.control_recv_all()
+        if not response.startswith("234"):
+            raise Exception(f"Server refused AUTH TLS: {response}")
+        start = time.monotonic()
+        self.s = self.ssl_context.wrap_socket(self.s, server_hostname=self.ip)
+        self._record_handshake(time.monotonic() - start, False)
+        self.tls_stats["tls_version"] = self.s.version()
+        for cmd in ("PBSZ 0", "PROT P"):
+            self.send_cmd(cmd)
+            response = self.control_recv_all()
+            if not response.startswith("200"):
+                raise Exception(f"Server refused {cmd}: {response}")
+        print(f"TLS established ({self.s.version()})")
+
+    def _record_handshake(self, seconds: float, resumed: bool):
+        kind = "resumed" if resumed else "full"
+        self.tls_stats[f"tls_{kind}_handshakes"] += 1
+        self.tls_stats[f"tls_{kind}_ms"] = round(self.tls_stats[f"tls_{kind}_ms"] + seconds * 1000, 3)
+        self.tuning.update(self.tls_stats)
+
+    def _control_pending(self) -> bool:
+        # 已收到但尚未处理的控制连接数据；TLS 解密后的数据留在 SSL 缓冲区里，select 看不到
+        return bool(self._recv_buffer) or (self.tls and self.s.pending() > 0)
+
+    def _control_readable(self, timeout: float) -> bool:
+        return self._control_pending() or bool(select.select([self.s], [], [], timeout)[0])
+
+    def _new_data_socket(self) -> socket.socket:
+        # 缓冲区必须在 connect/listen 之前设置，窗口扩大因子在握手时协商。
+        # 带宽时延积不超过系统默认值时不设置，以保留内核的自动调整
+        data_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        wanted = self.transport.buffer_size(self.rtt)
+        for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+            if wanted > data_socket.getsockopt(socket.SOL_SOCKET, option):
+                data_socket.setsockopt(socket.SOL_SOCKET, option, wanted)
+        self.tuning["buffer_requested"] = wanted
+        self.tuning["rcvbuf"] = data_socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        self.tuning["sndbuf"] = data_socket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+        data_socket.settimeout(self.transport.connect_timeout)
+        return data_socket
+
+    def tuning_report(self) -> str:
+        return ", ".join(f"{key}={value}" for key, value in self.tuning.items())
+
+    def reconnect(self):
+        # 重新建立控制连接并恢复会话状态，失败时按指数退避重试
+        delay = 1.0
+        for attempt in range(1, self.max_reconnects + 1):
+            try:
+                self.s.close()
+            except OSError:
+                pass
+            try:
+                self.connect()
+                self._restore_session()
+                self._set_connected(True, "会话已自动恢复")
+                return
+            except OSError as e:
+                print(f"Reconnect failed: {e} ({attempt}/{self.max_reconnects})")
+                if attempt == self.max_reconnects:
+                    self._set_connected(False, f"重连失败: {e}")
+                    raise
+                time.sleep(delay)
+                delay *= 2
+
+    def _restore_session(self):
+        if self.username is not None:
+            self.login(self.username, self.password)
+        if self.cwd:
+            self._send_expect(f"CWD {self.cwd}", "250")
+        self._restore_transfer_settings()
+
+    def _restore_transfer_settings(self):
+        # 重新发送已选择的 TYPE 和 MODE（新连接上都是服务器默认值）
+        if self.transfer_mode in ["binary", "text"]:
+            self._send_expect("TYPE I" if self.transfer_mode == "binary" else "TYPE A", "200")
+        if self.transfer_method != "stream":
+            self._send_expect(
+                "MODE B" if self.transfer_method == "block" else "MODE C", "200"
+            )
+
+    def _send_expect(self, cmd: str, code: str) -> str:
+        self.send_cmd(cmd)
+        response = self.control_recv_all()
+        if not response.startswith(code):
+            raise ConnectionError(f"Failed to restore session ({cmd}): {response}")
+        return response
+
+    def _set_connected(self, connected: bool, message: str):
+        self.connected = connected
+        if self.on_state_change:
+            self.on_state_change(connected, message)
+
+    def noop(self) -> str:
+        self.send_cmd("NOOP")
+        return self.control_recv_all()
+
+    def is_alive(self, timeout: float = 10.0) -> bool:
+        # 发送 NOOP 探测控制连接，超时或连接被关闭都视为失效
+        previous_timeout = self.s.gettimeout()
+        try:
+            self.s.settimeout(timeout)
+            return self.noop().startswith("200")
+        except OSError:
+            return False
+        finally:
+            try:
+                self.s.settimeout(previous_timeout)
+            except OSError:
+                pass
+
+    def start_keepalive(self):
+        if self.keepalive_interval is None:
+            return
+        if self._keepalive_thread and self._keepalive_thread.is_alive():
+            return
+        self._keepalive_stop.clear()
+        self._keepalive_thread = threading.Thread(
+            target=self._keepalive_loop, daemon=True
+        )
+        self._keepalive_thread.start()
+
+    def stop_keepalive(self):
+        self._keepalive_stop.set()
+
+    def _keepalive_loop(self):
+        # 空闲时定期发送 NOOP；控制连接正被使用时（例如传输中）跳过，
+        # 传输循环会自行在控制连接上发送 NOOP
+        while not self._keepalive_stop.wait(min(self.keepalive_interval, 1.0)):
+            if time.monotonic() - self.last_activity < self.keepalive_interval:
+                continue
+            if not self.lock.acquire(blocking=False):
+                continue
+            try:
+                if not self.is_alive():
+                    self._set_connected(False, "控制连接已断开，正在重连...")
+                    self.reconnect()
+            except OSError as e:
+                print(f"Keepalive error: {e}")
+            finally:
+                self.lock.release()
+
+    def _keepalive_during_transfer(self) -> int:
+        # 长时间传输期间控制连接没有流量，发送 NOOP 防止被空闲超时断开。
+        # 返回发送的 NOOP 数量，应答在传输结束后由 _finish_transfer 读取。
+        if self.keepalive_interval is None:
+            return 0
+        if time.monotonic() - self.last_activity < self.keepalive_interval:
+            return 0
+        self.send_cmd("NOOP")
+        return 1
+
+    def _finish_transfer(self, pending_noops: int = 0) -> str:
+        # 读取传输完成应答，并丢弃传输期间发送的 NOOP 的应答（顺序因服务器而异）
+        result = None
+        while result is None or pending_noops > 0:
+            response = self.control_recv_all()
+            if response.startswith("200") and pending_noops > 0:
+                pending_noops -= 1
+            else:
+                result = response
+        return result
 
     def initialize_data_socket(self) -> socket.socket:
         if self.mode == "passive":
@@ -42,8 +679,9 @@ class FTPClient:
                 pasv_info = response[start:end].split(",")
                 data_ip = self.ip
                 data_port = (int(pasv_info[4]) << 8) + int(pasv_info[5])
-                data_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                data_socket = self._new_data_socket()
                 data_socket.connect((data_ip, data_port))
+                data_socket.settimeout(self.transport.idle_timeout)
                 return data_socket
             else:
                 retries += 1
@@ -53,98 +691,177 @@ class FTPClient:
         raise Exception("Failed to initialize passive socket after maximum retries.")
 
     def initialize_active_socket(self) -> socket.socket:
-        def _find_free_port():
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.bind(("", 0))
-                return s.getsockname()[1]
-
-        def _ip_to_port():
-            ip_parts = self.ip.split(".")
-            return (
-                ",".join(ip_parts) + f",{self.data_port >> 8},{self.data_port & 0xFF}"
-            )
-
-        self.data_port = _find_free_port()
-        self.s.send(f"PORT {_ip_to_port()}\r\n".encode())
+        # 返回监听套接字，服务器在收到传输命令后才连入，见 _accept_data_connection
+        data_socket = self._new_data_socket()
+        # 通告控制连接的本地地址，服务器只能连回这个地址
+        data_socket.bind((self.s.getsockname()[0], 0))
+        data_socket.listen(1)
+        host, port = data_socket.getsockname()[:2]
+        self.send_cmd(f"PORT {host.replace('.', ',')},{port >> 8},{port & 0xFF}")
         response = self.control_recv_all()
         if not response.startswith("200"):
+            data_socket.close()
             raise Exception("Failed to enter Active Mode")
-        data_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        data_socket.bind(("", self.data_port))
-        data_socket.listen(1)
         return data_socket
 
+    def _accept_data_connection(self, data_socket: socket.socket) -> socket.socket:
+        # 在服务器回复 1xx 后调用：主动模式下接受数据连接；启用 TLS 时在此握手，
+        # 服务器要到收到传输命令后才会在数据连接上开始 TLS
+        if self.mode == "active":
+            try:
+                conn, _ = data_socket.accept()
+            finally:
+                data_socket.close()
+            conn.settimeout(self.transport.idle_timeout)
+            data_socket = conn
+        if not self.tls:
+            return data_socket
+        # 复用控制连接的 TLS 会话，省去完整握手；有的服务器（如 vsftpd 的
+        # require_ssl_reuse）也要求数据连接必须复用
+        start = time.monotonic()
+        try:
+            secure = self.ssl_context.wrap_socket(
+                data_socket, server_hostname=self.ip, session=self.s.session
+            )
+        except BaseException:
+            data_socket.close()
+            raise
+        self._record_handshake(time.monotonic() - start, secure.session_reused)
+        return secure
+
+    def _close_data_socket(self, data_socket: socket.socket):
+        # 数据传完后关闭数据连接。TLS 下先发送 close_notify：上传时有的服务器否则会把
+        # 文件视为被截断，下载时服务器可能在等待这个应答
+        if self.tls:
+            try:
+                data_socket = data_socket.unwrap()
+            except (OSError, ValueError):
+                pass
+        data_socket.close()
+
+    def _recv_line(self) -> bytes:
+        while b"\n" not in self._recv_buffer:
+            part = self.s.recv(4096)
+            if not part:
+                raise ConnectionResetError("Control connection closed by server")
+            self._recv_buffer += part
+        line, _, self._recv_buffer = self._recv_buffer.partition(b"\n")
+        return line + b"\n"
+
     def control_recv_all(self) -> str:
-        data = b""
-        while True:
-            part = self.s.recv(1024)
-            data += part
-            if len(part) < 1024:
-                break
-        return data.decode()
+        # 读取一条完整的应答，多行应答（"xyz-" ... "xyz "）作为整体返回
+        line = self._recv_line()
+        lines = [line]
+        if line[3:4] == b"-":
+            code = line[:3]
+            while True:
+                line = self._recv_line()
+                lines.append(line)
+                if line[:3] == code and line[3:4] == b" ":
+                    break
+        self.last_activity = time.monotonic()
+        return b"".join(lines).decode("utf-8", errors="replace")
 
     def send_cmd(self, cmd: str):
-        self.s.send(cmd.encode() + b"\r\n")
-        time.sleep(0.1)
-        return
+        # 打开的 RetrStream 还有未读的应答（226、传输期间 NOOP 的 200），
+        # 其他命令会把它们当作自己的应答读走
+        if self._open_stream is not None:
+            raise Exception(
+                "A retr_stream() is still open on this session; close it or use clone()"
+            )
+        self.s.sendall(cmd.encode() + b"\r\n")
+        self.last_activity = time.monotonic()
+
+    def pwd(self) -> str:
+        self.send_cmd("PWD")
+        return self.control_recv_all().split('"')[1]
 
     def login(self, username: str = "anonymous", password: str = "anonymous@"):
+        self.username = username
+        self.password = password
         self.send_cmd("USER " + username)
         print(self.control_recv_all())
         self.send_cmd("PASS " + password)
-        print(self.control_recv_all())
+        response = self.control_recv_all()
+        print(response)
+        if response.startswith("230") and self.cwd is None:
+            self.cwd = self.pwd()
 
+    @_supervised
     def list(self):
-        try:
-            data_socket = self.initialize_data_socket()
-            self.send_cmd("LIST")
+        print(self._list_over_data(None))
 
-            response = self.control_recv_all().split("\r\n")
-            print(response[0])
+    @_supervised
+    def list_content(self, path: str | None = None):
+        if self.stat_listing is not False and path not in self._large_dirs:
+            listing = self._stat_listing(path)
+            if listing is not None:
+                return listing
+        return self._list_over_data(path)
 
-            data = b""
-            while True:
-                part = data_socket.recv(1024)
-                data += part
-                if len(part) < 1024:
-                    data_socket.close()
-                    break
-            print(data.decode())
-            print("Listing complete")
-            if len(response) == 2:
-                print(self.control_recv_all())
-            else:
-                print(response[1])
-        except socket.error as e:
-            print(f"Socket error: {e}")
-            data_socket.close()
+    def _stat_listing(self, path: str | None) -> str | None:
+        # 多行 213/211/212 应答的中间各行就是 "ls -l" 格式的列表（行首可能有空格或
+        # "213-"）。服务器不支持、路径出错或应答不像列表时返回 None，由 LIST 处理
+        self.send_cmd(f"STAT {path or '.'}")
+        response = self.control_recv_all()
+        code = response[:3]
+        if code not in ("211", "212", "213") or response[3:4] != "-":
+            # 单行 211 说明服务器忽略了路径，只返回了自身状态
+            if code in ("211", "500", "501", "502", "504"):
+                self.stat_listing = False  # 服务器不支持带参数的 STAT
+            return None
+        lines = response.split("\r\n") if "\r\n" in response else response.split("\n")
+        body = []
+        for line in lines[1:]:
+            if line[:3] == code and line[3:4] == " ":
+                break
+            if line[:3] == code and line[3:4] == "-":
+                line = line[4:]
+            body.append(line[1:] if line.startswith(" ") else line)
+        if self.stat_listing is None:
+            # 第一次使用时确认应答确实是列表，而不是服务器状态说明
+            parsed = parse_listing("\n".join(body))
+            if body and not parsed:
+                self.stat_listing = False
+                return None
+            if parsed:
+                self.stat_listing = True
+        if len(body) > self.stat_max_entries:
+            self._large_dirs.add(path)
+        print(f"Listing complete (STAT, {len(body)} lines)")
+        return "\r\n".join(body) + ("\r\n" if body else "")
 
-    def list_content(self):
+    def _list_over_data(self, path: str | None) -> str:
+        data_socket = None
         try:
             data_socket = self.initialize_data_socket()
-            self.send_cmd("LIST")
+            self.send_cmd(f"LIST {path}" if path else "LIST")
 
-            response = self.control_recv_all().split("\r\n")
-            print(response[0])
+            response = self.control_recv_all()
+            print(response)
+            if not response.startswith("1"):
+                # 服务器拒绝列出（例如 550），不会打开数据连接
+                raise Exception(f"Failed to list {path or '.'}. Server response: {response}")
+            data_socket = self._accept_data_connection(data_socket)
 
-            data = b""
-            while True:
-                part = data_socket.recv(1024)
-                data += part
-                if len(part) < 1024:
-                    data_socket.close()
-                    break
+            # 读到数据连接关闭为止，大目录的列表会分多次到达
+            data = self.recv_all_from_data_socket(data_socket)
+            self._close_data_socket(data_socket)
+            data_socket = None
+            # 1xx 应答可能是多行的，完成应答总是单独的一条
+            response = self._finish_transfer()
+            print(response)
+            if not response.startswith("2"):
+                raise Exception(f"Failed to list {path or '.'}. Server response: {response}")
             print("Listing complete")
-            if len(response) == 2:
-                print(self.control_recv_all())
-            else:
-                print(response[1])
-                
-            return data.decode()
+            return data
         except socket.error as e:
             print(f"Socket error: {e}")
-            data_socket.close()
+            if data_socket:
+                data_socket.close()
+            raise
 
+    @_supervised
     def change_dir(self, path: str):
         self.send_cmd("CWD " + path)
         response = self.control_recv_all()
@@ -152,8 +869,11 @@ class FTPClient:
             raise Exception(
                 f"Failed to change directory to {path}. Server response: {response}"
             )
+        if self.cwd is not None:
+            self.cwd = posixpath.normpath(posixpath.join(self.cwd, path))
         print(response)
 
+    @_supervised
     def set_transfer_mode(self, transfer_mode: str):
         if transfer_mode not in ["binary", "text"]:
             raise ValueError("Invalid transfer mode. Use 'binary' or 'text'.")
@@ -167,6 +887,7 @@ class FTPClient:
             )
         print(response)
 
+    @_supervised
     def set_transfer_method(self, transfer_method: str):
         if transfer_method not in ["stream", "block", "compressed"]:
             raise ValueError(
@@ -191,68 +912,106 @@ class FTPClient:
     def recv_all_from_data_socket(self, data_socket):
         data = []
         while True:
-            part = data_socket.recv(1024)
+            part = data_socket.recv(65536)
             if not part:
                 break
-            data.append(part.decode("utf-8"))
-        return "".join(data)
+            data.append(part)
+        # 整体解码，避免多字节字符被拆在两个数据块之间
+        return b"".join(data).decode("utf-8", errors="replace")
 
-    def download(self, remote_filename: str, local_filename: str | None = None):
+    @_supervised
+    def download(
+        self,
+        remote_filename: str,
+        local_filename: str | None = None,
+        is_dir: bool | None = None,
+    ):
+        # is_dir 已知时（例如来自界面上的列表）直接使用，未知时才探测一次
         if local_filename is None:
             local_filename = remote_filename
 
         try:
-            # 记录当前目录
-            self.send_cmd("PWD")
-            dir_response = self.control_recv_all().split('"')
-            print(dir_response)
-            current_directory = dir_response[1]
-            print(current_directory)
-
-            # 使用CWD命令检查远程文件是否是目录
-            self.send_cmd(f"CWD {remote_filename}")
-            response = self.control_recv_all()
-
-            if response.startswith("250"):
-                # 如果是目录，创建本地目录并返回上一级目录
-                self.send_cmd(f"CWD {current_directory}")
-                self.control_recv_all()
-                if not os.path.exists(local_filename):
-                    os.makedirs(local_filename)
-
-                # 使用LIST命令列出目录内容
-                data_socket = self.initialize_data_socket()
-                self.send_cmd(f"LIST {remote_filename}")
-                self.control_recv_all()
-                response = self.recv_all_from_data_socket(data_socket).split("\r\n")
-                data_socket.close()
-
-                for line in response:
-                    if line and not line.startswith("total"):
-                        parts = line.split()
-                        name = parts[-1]
-                        if line.startswith("d"):
-                            self.download(
-                                f"{remote_filename}/{name}", f"{local_filename}/{name}"
-                            )
-                        else:
-                            self._download_file(
-                                f"{remote_filename}/{name}", f"{local_filename}/{name}"
-                            )
+            if is_dir is None:
+                is_dir = self._probe_is_dir(remote_filename)
+            if is_dir:
+                return self._download_tree(remote_filename, local_filename)
             else:
                 # 如果是文件，直接下载文件
-                self._download_file(remote_filename, local_filename)
+                return self._download_file(remote_filename, local_filename)
         except Exception as e:
             print(f"Download error: {e}")
             traceback.print_exc()
+            return False
+
+    def _probe_is_dir(self, remote_path: str) -> bool:
+        # 使用CWD命令检查远程路径是否是目录，成功时回到记录的当前目录
+        current_directory = self.cwd or self.pwd()
+        self.send_cmd(f"CWD {remote_path}")
+        if not self.control_recv_all().startswith("250"):
+            return False
+        self.send_cmd(f"CWD {current_directory}")
+        self.control_recv_all()
+        return True
+
+    def list_entries(self, path: str | None = None) -> list:
+        # 条目格式见 ftp_listing.parse_listing，符号链接的名称已去掉 " -> 目标"
+        entries = parse_listing(self.list_content(path) or "")
+        return [entry for entry in entries if entry[6] not in (".", "..")]
+
+    def _download_tree(self, remote_dir: str, local_dir: str) -> bool:
+        # 每个目录只发一次 LIST，条目类型取自列表中的权限位，
+        # 远程路径在本地拼接，不再逐项 PWD/CWD 探测
+        journal = self.journal
+        if journal and journal.is_done("get-dir", remote_dir, local_dir):
+            return True  # 整个目录在上次运行中已完成，不再列出
+        if not os.path.exists(local_dir):
+            os.makedirs(local_dir)
+        complete = True
+        for entry in self.list_entries(remote_dir):
+            permissions, name = entry[0], entry[6]  # 符号链接按文件下载，由服务器解析目标
+            remote_path = posixpath.join(remote_dir, name)
+            local_path = os.path.join(local_dir, name)
+            if permissions.startswith("d"):
+                complete = self._download_tree(remote_path, local_path) and complete
+            else:
+                complete = self._download_file(remote_path, local_path) and complete
+        if journal and complete:
+            journal.record_done("get-dir", remote_dir, local_dir)
+        return complete
+
+    @_supervised
+    def _download_file(self, remote_filename: str, local_filename: str) -> bool:
+        journal = self.journal
+        offset = None
+        if journal:
+            if journal.is_done("get", remote_filename, local_filename):
+                return True
+            offset = journal.offset("get", remote_filename, local_filename)
+
+        # 预分配时先写到 <名称>.part，收到 2xx 后才改名。预分配的文件一开始就是远程大小，
+        # 进程被杀时文件大小不代表已收到的字节，不能让它以最终文件名出现（会被当作已完成）
+        # 传输出错时 finally 会把 .part 截断到实际写入的字节数，所以比远程小的 .part 可以续传；
+        # 等于（或不小于）远程大小的说明进程在截断之前被杀，没有检查点时只能从头下载
+        preallocate = self.transport.preallocate
+        write_path = local_filename + ".part" if preallocate else local_filename
+        remote_size = self._remote_size(remote_filename) if preallocate else -1
+        if preallocate and os.path.exists(write_path):
+            if offset is None and not 0 <= os.path.getsize(write_path) < remote_size:
+                os.remove(write_path)
+        elif preallocate and os.path.exists(local_filename):
+            os.replace(local_filename, write_path)  # 未预分配时留下的部分文件，大小可信
+        # 只信任日志中记录的、已经落盘的部分，之后的数据在崩溃时可能不完整
+        if offset is not None and os.path.exists(write_path):
+            if os.path.getsize(write_path) > offset:
+                os.truncate(write_path, offset)
 
-    def _download_file(self, remote_filename: str, local_filename: str):
         local_file_size = 0
-        if os.path.exists(local_filename):
-            local_file_size = os.path.getsize(local_filename)
+        if os.path.exists(write_path):
+            local_file_size = os.path.getsize(write_path)
         else:
             local_file_size = -1  # 本地文件不存在
 
+        data_socket = None
         try:
             data_socket = self.initialize_data_socket()
 
@@ -270,50 +1029,125 @@ class FTPClient:
                 print(
                     f"Failed to retrieve {remote_filename}. Server response: {response[0]}"
                 )
-                return
+                return False
+            data_socket = self._accept_data_connection(data_socket)
+
+            # 预分配会改变文件大小，所以不用追加模式，而是定位到续传位置写入
+            mode = "r+b" if local_file_size > 0 else "wb"
+            pending_noops = 0
+            position = max(local_file_size, 0)
+            digest = None
+            next_checkpoint = None
+            if journal:
+                # 续传时先补算已有部分的摘要
+                digest = hashlib.sha256()
+                if position > 0:
+                    with open(write_path, "rb") as existing:
+                        update_digest(digest, existing)
+                next_checkpoint = position + journal.checkpoint_bytes
 
-            mode = "ab" if local_file_size > 0 else "wb"
-            with open(local_filename, mode) as f:
-                while True:
-                    part = data_socket.recv(1024)
-                    if not part:
-                        break
-                    f.write(part)
+            def on_written(data):
+                # 在写线程中调用：只有真正写入文件的数据才计入位置、摘要和检查点
+                nonlocal position, next_checkpoint
+                position += len(data)
+                if journal:
+                    digest.update(data)
+                    if position >= next_checkpoint:
+                        f.flush()
+                        os.fsync(f.fileno())
+                        journal.record_partial("get", remote_filename, local_filename, position)
+                        next_checkpoint = position + journal.checkpoint_bytes
+
+            with open(write_path, mode) as f:
+                f.seek(position)
+                preallocated = remote_size > position and preallocate_file(f, remote_size)
+                writer = DiskWriter(f, self.transport.disk_buffers, self.transport.io_size, on_written)
+                try:
+                    while True:
+                        buf = writer.acquire()
+                        length = data_socket.recv_into(buf)
+                        if not length:
+                            writer.release(buf)
+                            break
+                        writer.submit(buf, length)
+                        pending_noops += self._keepalive_during_transfer()
+                finally:
+                    try:
+                        writer.close()
+                    finally:
+                        if preallocated:
+                            # 截掉未写到的预分配部分（传输中断或 ASCII 模式大小不同）
+                            f.truncate(position)
+            # 先关闭数据连接再等待完成应答，TLS 服务器可能在等待我们的 close_notify
+            self._close_data_socket(data_socket)
+            data_socket = None
             print(f"Downloaded {local_filename}")
-            if len(response) == 2:
-                print(self.control_recv_all())
-            else:
-                print(response[1])
+            response = self._finish_transfer(pending_noops)
+            print(response)
+            if not response.startswith("2"):
+                return False
+            if write_path != local_filename:
+                os.replace(write_path, local_filename)
+            if journal:
+                journal.record_done(
+                    "get", remote_filename, local_filename, size=position,
+                    digest=digest.hexdigest(), sync_path=local_filename,
+                )
+            return True
         except socket.error as e:
             print(f"Socket error: {e}")
+            raise
         finally:
-            data_socket.close()
+            if data_socket:
+                data_socket.close()
 
+    @_supervised
+    def mkdir(self, remote_dirname: str) -> bool:
+        self.send_cmd(f"MKD {remote_dirname}")
+        response = self.control_recv_all()
+        if not response.startswith("257"):
+            print(
+                f"Failed to create directory {remote_dirname}. Server response: {response}"
+            )
+            return False
+        return True
+
+    @_supervised
     def upload(self, local_filename: str, remote_filename: str | None = None):
         if remote_filename is None:
             remote_filename = local_filename
 
+        journal = self.journal
         try:
             if os.path.isdir(local_filename):
-                self.send_cmd(f"MKD {remote_filename}")
-                response = self.control_recv_all()
-                if not response.startswith("257"):
-                    print(
-                        f"Failed to create directory {remote_filename}. Server response: {response}"
-                    )
+                if journal and journal.is_done("put-dir", local_filename, remote_filename):
+                    return True  # 整个目录在上次运行中已完成
+                self.mkdir(remote_filename)
+                complete = True
                 for item in os.listdir(local_filename):
                     local_path = os.path.join(local_filename, item)
                     remote_path = f"{remote_filename}/{item}"
-                    self.upload(local_path, remote_path)
+                    complete = self.upload(local_path, remote_path) and complete
+                if journal and complete:
+                    journal.record_done("put-dir", local_filename, remote_filename)
+                return complete
             else:
-                self._upload_file(local_filename, remote_filename)
+                return self._upload_file(local_filename, remote_filename)
         except Exception as e:
             print(f"Upload error: {e}")
+            return False
 
-    def _upload_file(self, local_filename: str, remote_filename: str):
+    @_supervised
+    def _upload_file(self, local_filename: str, remote_filename: str) -> bool:
+        journal = self.journal
+        if journal and journal.is_done("put", local_filename, remote_filename):
+            return True  # 上次运行已完成，无需 SIZE 查询
+        # 上传的续传位置仍以服务器上的 SIZE 为准：已发送的字节不一定已被服务器写入
         local_file_size = os.path.getsize(local_filename)
         remote_file_size = -1  # 初始化为-1，表示远程文件不存在
         data_socket = None
+        # 摘要只在开启校验时才会用到，在发送的数据块上增量计算，不在传完后重读整个文件
+        digest = hashlib.sha256() if journal and journal.verify_digests else None
 
         try:
             self.send_cmd(f"SIZE {remote_filename}")
@@ -336,22 +1170,34 @@ class FTPClient:
                     print(
                         f"Failed to upload {remote_filename}. Server response: {response}"
                     )
-                    return
+                    return False
+                data_socket = self._accept_data_connection(data_socket)
 
+                pending_noops = 0
                 with open(local_filename, "rb") as f:
-                    while True:
-                        chunk = f.read(1024)
-                        if not chunk:
-                            break
-                        data_socket.send(chunk)
+                    reader = DiskReader(f, self.transport.disk_buffers, self.transport.io_size)
+                    try:
+                        for chunk in reader:
+                            data_socket.sendall(chunk)
+                            if digest:
+                                digest.update(chunk)
+                            pending_noops += self._keepalive_during_transfer()
+                    finally:
+                        reader.close()
+                self._close_data_socket(data_socket)
+                data_socket = None
                 print(f"Uploaded {local_filename} to {remote_filename}")
+                response = self._finish_transfer(pending_noops)
+                print(response)
             else:
                 # 如果远程文件大小与本地文件大小相同，跳过上传
                 if remote_file_size == local_file_size:
                     print(
                         f"{remote_filename} already exists on the server with the same size. Skipping upload."
                     )
-                    return
+                    if journal:
+                        journal.record_done("put", local_filename, remote_filename, size=local_file_size)
+                    return True
 
                 # 如果远程文件大小小于本地文件大小，进行断点续传
                 if remote_file_size > 0 and remote_file_size < local_file_size:
@@ -364,64 +1210,842 @@ class FTPClient:
                     print(
                         f"Failed to upload {remote_filename}. Server response: {response}"
                     )
-                    return
+                    return False
+                data_socket = self._accept_data_connection(data_socket)
 
+                pending_noops = 0
                 with open(local_filename, "rb") as f:
+                    if digest:
+                        update_digest(digest, f, remote_file_size)  # 服务器上已有的部分
                     f.seek(remote_file_size)
-                    while True:
-                        chunk = f.read(1024)
-                        if not chunk:
-                            break
-                        data_socket.send(chunk)
+                    reader = DiskReader(f, self.transport.disk_buffers, self.transport.io_size)
+                    try:
+                        for chunk in reader:
+                            data_socket.sendall(chunk)
+                            if digest:
+                                digest.update(chunk)
+                            pending_noops += self._keepalive_during_transfer()
+                    finally:
+                        reader.close()
+                self._close_data_socket(data_socket)
+                data_socket = None
                 print(f"Uploaded {local_filename} to {remote_filename}")
+                response = self._finish_transfer(pending_noops)
+                print(response)
+
+            if not response.startswith("2"):
+                return False
+            if journal:
+                journal.record_done(
+                    "put", local_filename, remote_filename, size=local_file_size,
+                    digest=digest.hexdigest() if digest else None,
+                )
+            return True
         except socket.error as e:
             print(f"Socket error: {e}")
+            raise
         finally:
             if data_socket:
                 data_socket.close()
 
+    def open_remote(
+        self,
+        remote_filename: str,
+        block_size: int = 256 * 1024,
+        cache_blocks: int = 64,
+        read_ahead: int = 4,
+    ) -> "RemoteFile":
+        # 打开远程文件用于随机读取，只取回实际读到的块。会话会切换到二进制模式，
+        # 否则 REST 偏移与文件内容对不上
+        if self.transfer_mode != "binary":
+            self.set_transfer_mode("binary")
+        with self.lock:
+            size = self._remote_size(remote_filename)
+        if size < 0:
+            raise Exception(f"Cannot open {remote_filename}: SIZE not available")
+        return RemoteFile(self, remote_filename, size, block_size, cache_blocks, read_ahead)
+
+    def retr_stream(self, remote_filename: str, offset: int = 0, on_progress=None) -> "RetrStream":
+        # 以只读流的形式取回远程文件，不落盘。返回的流持有会话锁直到关闭，
+        # 应在同一线程中用 with 使用；iter_chunks() 逐块迭代，内存占用固定。
+        # 流打开期间使用二进制模式，关闭时恢复原来的模式
+        return RetrStream(self, remote_filename, offset, on_progress)
+
+    def _switch_transfer_mode(self, transfer_mode: str) -> str:
+        # 切换 TYPE 并返回原来的模式。"ascii" 表示从未设置过，即服务器默认的 TYPE A
+        previous = self.transfer_mode
+        if (transfer_mode == "binary") != (previous == "binary"):
+            cmd = "TYPE I" if transfer_mode == "binary" else "TYPE A"
+            self.send_cmd(cmd)
+            response = self.control_recv_all()
+            if not response.startswith("200"):
+                raise Exception(f"Server refused {cmd}: {response}")
+        self.transfer_mode = transfer_mode
+        return previous
+
+    def _restore_transfer_mode(self, previous: str):
+        # 在 finally 中调用：连接已断开时只恢复记录的模式，重连时据此重新发送
+        try:
+            self._switch_transfer_mode(previous)
+        except OSError:
+            self.transfer_mode = previous
+
+    def stor_stream(
+        self,
+        remote_filename: str,
+        source,
+        resume: bool = False,
+        on_progress=None,
+    ) -> int:
+        # 把任意可读对象（有 read() 的文件对象）或 bytes 块的迭代器写入远程文件，
+        # 返回远程文件的最终大小。resume 为 True 时从服务器上已有的大小续传，
+        # 跳过 source 开头相应的字节。传输中断时只有可 seek 的 source 能重连续传，
+        # 迭代器中已经取出的数据无法重发。on_progress(position) 在每块发送后调用。
+        # 传输期间使用二进制模式，否则 REST 偏移和字节数不可靠，结束后恢复原来的模式
+        seekable = hasattr(source, "seek") and hasattr(source, "seekable") and source.seekable()
+        start = source.tell() if seekable else 0
+        with self.lock:
+            previous_mode = self._switch_transfer_mode("binary")
+            try:
+                return self._stor_with_retries(remote_filename, source, seekable, start, resume, on_progress)
+            finally:
+                self._restore_transfer_mode(previous_mode)
+
+    def _stor_with_retries(self, remote_filename, source, seekable, start, resume, on_progress) -> int:
+        offset = max(self._remote_size(remote_filename), 0) if resume else 0
+        attempt = 0
+        while True:
+            if seekable:
+                source.seek(start + offset)
+                chunks = self._source_chunks(source)
+            elif attempt == 0:
+                chunks = self._skip_bytes(self._source_chunks(source), offset)
+            try:
+                return self._stor_chunks(remote_filename, chunks, offset, on_progress)
+            except (ConnectionError, socket.timeout) as e:
+                if not seekable or attempt >= self.max_reconnects:
+                    self._set_connected(False, f"连接已断开: {e}")
+                    raise
+                attempt += 1
+                print(f"Connection lost ({e}). Resuming upload... ({attempt}/{self.max_reconnects})")
+                self.reconnect()
+                offset = max(self._remote_size(remote_filename), 0)
+
+    def _remote_size(self, remote_filename: str) -> int:
+        self.send_cmd(f"SIZE {remote_filename}")
+        response = self.control_recv_all()
+        if response.startswith("213"):
+            return int(response.split()[1])
+        return -1
+
+    def _source_chunks(self, source):
+        if hasattr(source, "read"):
+            return iter(lambda: source.read(self.transport.io_size), b"")
+        return iter(source)
+
+    @staticmethod
+    def _skip_bytes(chunks, count: int):
+        for chunk in chunks:
+            if count >= len(chunk):
+                count -= len(chunk)
+                continue
+            yield chunk[count:] if count else chunk
+            count = 0
+
+    def _stor_chunks(self, remote_filename: str, chunks, offset: int, on_progress) -> int:
+        data_socket = self.initialize_data_socket()
+        try:
+            if offset > 0:
+                self.send_cmd(f"REST {offset}")
+                response = self.control_recv_all()
+                if not response.startswith("350"):
+                    raise Exception(f"Server refused REST {offset}: {response}")
+            self.send_cmd("STOR " + remote_filename)
+            response = self.control_recv_all()
+            if not response.startswith("1"):
+                raise Exception(f"Failed to upload {remote_filename}. Server response: {response}")
+            data_socket = self._accept_data_connection(data_socket)
+            position = offset
+            pending_noops = 0
+            for chunk in chunks:
+                data_socket.sendall(chunk)
+                position += len(chunk)
+                pending_noops += self._keepalive_during_transfer()
+                if on_progress:
+                    on_progress(position)
+            self._close_data_socket(data_socket)
+            response = self._finish_transfer(pending_noops)
+            print(response)
+            if not response.startswith("2"):
+                raise Exception(f"Upload of {remote_filename} failed. Server response: {response}")
+            return position
+        finally:
+            data_socket.close()
+
+    def clone(self) -> "FTPClient":
+        # 用相同的服务器和登录信息打开一个独立的会话，供并行操作使用
+        session = FTPClient(
+            self.ip,
+            self.port,
+            mode=self.mode,
+            keepalive_interval=None,
+            max_reconnects=self.max_reconnects,
+            transport=self.transport,
+            stat_max_entries=self.stat_max_entries,
+            tls=self.tls,
+            ssl_context=self.ssl_context,
+        )
+        if self.username is not None:
+            session.login(self.username, self.password)
+        session.transfer_mode = self.transfer_mode
+        session.transfer_method = self.transfer_method
+        session._restore_transfer_settings()
+        session.journal = self.journal  # 同一任务的各个会话共用检查点日志
+        session.stat_listing = self.stat_listing
+        session._large_dirs = self._large_dirs
+        return session
+
     def quit(self):
-        self.send_cmd("QUIT")
-        self.s.close()
+        self.stop_keepalive()
+        with self.lock:
+            try:
+                self.send_cmd("QUIT")
+            finally:
+                self.s.close()
+                self.connected = False
+
 
 
-# def test_resume_download():
-#     # Step 1: Connect and login to the FTP server
-#     client = FTPClient(ip="127.0.0.1", port=21)
-#     client.login(username="anonymous", password="anonymous@")
-#     client.list()
+class RetrStream(io.RawIOBase):
+    # FTPClient.retr_stream() 返回的只读流。数据直接从数据连接读入调用者的缓冲区；
+    # 数据连接中断或服务器以 4xx 结束传输时，用 REST 从当前位置重新取回，
+    # 调用者看到的仍是连续的字节流。提前关闭时发送 ABOR。
+
+    def __init__(self, client: FTPClient, remote_filename: str, offset: int = 0, on_progress=None):
+        super().__init__()
+        self.client = client
+        self.remote_filename = remote_filename
+        self.position = offset  # 已读到的远程文件偏移
+        self.on_progress = on_progress  # on_progress(position)
+        self._data_socket = None
+        self._pending_noops = 0
+        self._eof = False
+        self._restarts = 0
+        client.lock.acquire()
+        try:
+            self._previous_mode = client._switch_transfer_mode("binary")
+            try:
+                self._open()
+            except BaseException:
+                client._restore_transfer_mode(self._previous_mode)
+                raise
+        except BaseException:
+            client.lock.release()
+            raise
+        client._open_stream = self
+
+    def _open(self):
+        client = self.client
+        data_socket = client.initialize_data_socket()
+        try:
+            if self.position > 0:
+                client.send_cmd(f"REST {self.position}")
+                response = client.control_recv_all()
+                if not response.startswith("350"):
+                    raise Exception(f"Server refused REST {self.position}: {response}")
+            client.send_cmd("RETR " + self.remote_filename)
+            response = client.control_recv_all()
+            if not response.startswith("1"):
+                raise Exception(
+                    f"Failed to retrieve {self.remote_filename}. Server response: {response}"
+                )
+            self._data_socket = client._accept_data_connection(data_socket)
+        except BaseException:
+            data_socket.close()
+            raise
+        self._pending_noops = 0
 
+    def _restart(self, reason, reconnect: bool):
+        if self._restarts >= self.client.max_reconnects:
+            raise Exception(f"Transfer of {self.remote_filename} failed: {reason}")
+        self._restarts += 1
+        print(f"Transfer interrupted ({reason}). Resuming at {self.position}...")
+        if self._data_socket is not None:
+            self._data_socket.close()
+            self._data_socket = None
+        # 流自己在控制连接上的命令不受 _open_stream 的限制
+        self.client._open_stream = None
+        try:
+            if reconnect:
+                self.client.reconnect()
+            self._open()
+        finally:
+            self.client._open_stream = self
 
-#     client.download("src", "srctest")
+    def readable(self) -> bool:
+        return True
 
-#     client.quit()
+    def readinto(self, buffer) -> int:
+        while not self._eof:
+            try:
+                count = self._data_socket.recv_into(buffer)
+                if count == 0:
+                    self.client._close_data_socket(self._data_socket)
+                    self._data_socket = None
+                    response = self.client._finish_transfer(self._pending_noops)
+                    print(response)
+                    if response.startswith("2"):
+                        self._eof = True
+                    elif response.startswith("4"):
+                        self._restart(response, reconnect=False)
+                    else:
+                        raise Exception(
+                            f"Transfer of {self.remote_filename} failed. Server response: {response}"
+                        )
+                    continue
+                self.position += count
+                self._restarts = 0  # 只限制连续失败的次数
+                self.client._open_stream = None
+                try:
+                    self._pending_noops += self.client._keepalive_during_transfer()
+                finally:
+                    self.client._open_stream = self
+                if self.on_progress:
+                    self.on_progress(self.position)
+                return count
+            except (ConnectionError, socket.timeout) as e:
+                self._restart(e, reconnect=True)
+        return 0
 
-#     print("Download resumed and completed successfully.")
+    def iter_chunks(self, size: int | None = None):
+        buffer = bytearray(size or self.client.transport.io_size)
+        view = memoryview(buffer)
+        while True:
+            count = self.readinto(view)
+            if not count:
+                return
+            yield bytes(view[:count])
 
+    def close(self):
+        if self.closed:
+            return
+        client = self.client
+        client._open_stream = None
+        try:
+            if self._data_socket is not None:
+                # 没读完就关闭：中止传输并读掉 ABOR 和传输期间 NOOP 的应答
+                self._data_socket.close()
+                self._data_socket = None
+                # ABOR 之后依次是传输的结束应答（426 或 226）和 ABOR 的应答，有的服务器只回一条。
+                # 紧接着发送 NOOP：它的 200 一定是最后一条应答，读到它就知道前面的都已读完，
+                # 不必靠超时猜测第二条是否还会到达。传输期间 NOOP 的 200 应答也在其中
+                client.send_cmd("ABOR")
+                client.send_cmd("NOOP")
+                pending_noops = self._pending_noops + 1
+                while pending_noops > 0:
+                    response = client.control_recv_all()
+                    print(response)
+                    if response.startswith("200"):
+                        pending_noops -= 1
+        except OSError as e:
+            print(f"Error while aborting {self.remote_filename}: {e}")
+        finally:
+            try:
+                client._restore_transfer_mode(self._previous_mode)
+            finally:
+                client.lock.release()
+                super().close()
 
-# def test_resume_upload():
-#     # Step 1: Connect and login to the FTP server
-#     client = FTPClient(ip="127.0.0.1", port=21)
-#     client.login(username="anonymous", password="anonymous@")
-#     client.change_dir("账单")
 
-#     # Create a test file to upload
-#     test_filename = "src"
+class RemoteFile(io.RawIOBase):
+    # FTPClient.open_remote() 返回的可 seek 只读文件。按块读取：未命中缓存的块用
+    # REST + RETR 取回，读够后 ABOR；块保存在 LRU 缓存中。连续顺序读取时一次多取
+    # read_ahead 个块，并保持 RETR 打开以便下一次直接接着读，随机访问时才中止。
+    # 保持打开期间会话被占用，其他传输请先 close() 或使用 clone()。
 
-#     client.upload(test_filename, "src_test")
+    def __init__(
+        self,
+        client: FTPClient,
+        remote_filename: str,
+        size: int,
+        block_size: int = 256 * 1024,
+        cache_blocks: int = 64,
+        read_ahead: int = 4,
+    ):
+        super().__init__()
+        self.client = client
+        self.remote_filename = remote_filename
+        self.size = size
+        self.block_size = block_size
+        self.cache_blocks = max(1, cache_blocks)
+        self.read_ahead = max(0, min(read_ahead, self.cache_blocks - 1))
+        self.position = 0
+        self.requests = 0  # 发出的 RETR 次数
+        self.bytes_fetched = 0  # 从服务器取回的字节数
+        self._cache = OrderedDict()  # 块序号 -> bytes，按最近使用排序
+        self._stream = None
+        self._last_index = None
 
-#     client.quit()
+    def readable(self) -> bool:
+        return True
 
-#     print("Upload resumed and completed successfully.")
+    def seekable(self) -> bool:
+        return True
 
+    def tell(self) -> int:
+        return self.position
 
-# # Run the test
-# test_resume_download()
-# # test_resume_upload()
-client = FTPClient(ip="127.0.0.1", port=21)
-client.login(username="anonymous", password="anonymous@")
-client.list()
-client.change_dir("src")
-client.list()
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self.position = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        if self.position >= self.size:
+            return 0
+        index, start = divmod(self.position, self.block_size)
+        chunk = self._block(index)[start:start + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+    def read(self, size: int = -1) -> bytes:
+        # 与普通文件一致，读满 size 字节或到文件末尾才返回
+        if size is None or size < 0:
+            size = max(self.size - self.position, 0)
+        parts = []
+        while size > 0:
+            buffer = bytearray(min(size, self.block_size))
+            count = self.readinto(buffer)
+            if not count:
+                break
+            parts.append(bytes(buffer[:count]))
+            size -= count
+        return b"".join(parts)
+
+    def _block(self, index: int) -> bytes:
+        sequential = self._last_index is not None and index == self._last_index + 1
+        self._last_index = index
+        block = self._cache.get(index)
+        if block is not None:
+            self._cache.move_to_end(index)
+            return block
+        last_index = (self.size - 1) // self.block_size
+        count = min(1 + (self.read_ahead if sequential else 0), last_index - index + 1)
+        offset = index * self.block_size
+        if self._stream is None or self._stream.position != offset:
+            self._close_stream()
+            self._stream = self.client.retr_stream(self.remote_filename, offset=offset)
+            self.requests += 1
+        for i in range(index, index + count):
+            self._store(i, self._read_from_stream(min(self.block_size, self.size - i * self.block_size)))
+        if self._stream.position >= self.size:
+            self._stream.read(1)  # 读到数据连接关闭和传输完成应答，无需 ABOR
+            self._close_stream()
+        elif not sequential:
+            self._close_stream()
+        return self._cache[index]
+
+    def _read_from_stream(self, length: int) -> bytes:
+        buffer = bytearray(length)
+        view = memoryview(buffer)
+        received = 0
+        while received < length:
+            count = self._stream.readinto(view[received:])
+            if not count:
+                break
+            received += count
+        self.bytes_fetched += received
+        return bytes(buffer[:received])
+
+    def _store(self, index: int, block: bytes):
+        self._cache[index] = block
+        self._cache.move_to_end(index)
+        while len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+
+    def _close_stream(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def close(self):
+        if not self.closed:
+            self._close_stream()
+            self._cache.clear()
+        super().close()
+
+
+class RemoteSearch:
+    # 用有限个并行会话递归遍历远程目录树，按名称（通配符或正则）、大小和修改时间匹配，
+    # 每找到一个结果就通过 on_match(path, entry) 回调，可随时 cancel()。
+    # listing_cache 为 目录绝对路径 -> 原始列表文本，命中时不再访问服务器，
+    # 新取得的列表也会写回其中。
+
+    def __init__(
+        self,
+        client: FTPClient,
+        root: str,
+        pattern: str | None = None,
+        regex: bool = False,
+        min_size: int | None = None,
+        max_size: int | None = None,
+        newer_than: datetime | None = None,
+        older_than: datetime | None = None,
+        workers: int = 4,
+        listing_cache: dict | None = None,
+        on_match=None,
+    ):
+        self.client = client
+        self.root = root
+        if pattern and regex:
+            self.match_name = re.compile(pattern, re.IGNORECASE).search
+        elif pattern:
+            lowered = pattern.lower()
+            self.match_name = lambda name: fnmatch.fnmatchcase(name.lower(), lowered)
+        else:
+            self.match_name = lambda name: True
+        self.min_size = min_size
+        self.max_size = max_size
+        self.newer_than = newer_than
+        self.older_than = older_than
+        self.workers = max(1, workers)
+        self.listing_cache = listing_cache if listing_cache is not None else {}
+        self.on_match = on_match
+        self.matches = []
+        self.errors = []
+        self._cancelled = threading.Event()
+        self._queue = queue.Queue()
+        self._pending = 0  # 已入队但尚未处理完的目录数
+        self._pending_lock = threading.Lock()
+        self._done = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._done.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def matches_entry(self, entry) -> bool:
+        permissions, _, _, _, size, mod_time_str, name, _ = entry
+        if not self.match_name(name):
+            return False
+        if not permissions.startswith("d"):
+            if self.min_size is not None and size < self.min_size:
+                return False
+            if self.max_size is not None and size > self.max_size:
+                return False
+        elif self.min_size is not None or self.max_size is not None:
+            return False
+        if self.newer_than is not None or self.older_than is not None:
+            mod_time = parse_mod_time(mod_time_str)
+            if self.newer_than is not None and mod_time < self.newer_than:
+                return False
+            if self.older_than is not None and mod_time > self.older_than:
+                return False
+        return True
+
+    def run(self) -> list:
+        self._enqueue(self.root)
+        threads = [
+            threading.Thread(target=self._worker, daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        self._done.wait()
+        for thread in threads:
+            thread.join()
+        return self.matches
+
+    def _enqueue(self, path: str):
+        with self._pending_lock:
+            self._pending += 1
+        self._queue.put(path)
+
+    def _task_done(self):
+        with self._pending_lock:
+            self._pending -= 1
+            if self._pending == 0:
+                self._done.set()
+
+    def _list(self, session, path: str) -> str:
+        listing = self.listing_cache.get(path)
+        if listing is None:
+            listing = session.list_content(path) or ""
+            self.listing_cache[path] = listing
+        return listing
+
+    def _worker(self):
+        session = None
+        try:
+            while not self._done.is_set():
+                try:
+                    path = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                try:
+                    if self.cancelled:
+                        continue
+                    listing = self.listing_cache.get(path)
+                    if listing is None:
+                        # 只有缓存未命中时才建立会话
+                        if session is None:
+                            session = self.client.clone()
+                        listing = self._list(session, path)
+                    for entry in parse_listing(listing):
+                        if entry[6] in (".", ".."):
+                            continue
+                        full_path = posixpath.join(path, entry[6])
+                        if self.matches_entry(entry):
+                            self.matches.append((full_path, entry))
+                            if self.on_match:
+                                self.on_match(full_path, entry)
+                        # 符号链接不跟随，避免循环
+                        if entry[0].startswith("d"):
+                            self._enqueue(full_path)
+                except Exception as e:
+                    self.errors.append((path, str(e)))
+                finally:
+                    self._task_done()
+        finally:
+            if session is not None:
+                try:
+                    session.quit()
+                except OSError:
+                    pass
+
+
+class FXPTransfer:
+    # 服务器之间直接传输（FXP）：目标服务器进入 PASV，源服务器用 PORT 指向它，
+    # 再分别发送 STOR / RETR，数据不经过本机。两端都必须允许与第三方地址传输，
+    # 很多服务器出于安全考虑默认关闭。目录递归传输，目标上已有的部分通过 REST 续传。
+    # 进度通过 on_progress(path, file_done, file_size, total_done, total_size) 回调；
+    # 传输中的字节数由一个单独的监视会话对目标文件发 SIZE 得到，
+    # 超过 idle_timeout 没有增长时视为停滞并中止。
+
+    STALL_TIMEOUT = 120.0  # 目标会话的 idle_timeout 为 None（不限时）时使用，避免永远等待
+
+    def __init__(
+        self,
+        source: FTPClient,
+        target: FTPClient,
+        on_progress=None,
+        poll_interval: float = 1.0,
+        monitor: bool = True,
+    ):
+        self.source = source
+        self.target = target
+        self.on_progress = on_progress
+        self.poll_interval = poll_interval
+        self.monitor = monitor
+        self.total_size = 0
+        self.total_done = 0
+        self.results = []  # 每个文件一条 {"source", "target", "bytes", "status", "error"}
+        self._monitor_session = None
+        self._cancelled = threading.Event()
+        # 目标服务器的地址只解析一次，每个文件的 PASV 都要用它判断是否需要替换内网地址
+        self._target_address = socket.gethostbyname(target.ip)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def run(self, source_path: str, target_path: str, is_dir: bool | None = None) -> bool:
+        # 先遍历出全部文件以得到总字节数，再逐个传输
+        self.source.set_transfer_mode("binary")
+        self.target.set_transfer_mode("binary")
+        if self.source.tls or self.target.tls:
+            # 两端都是 PROT P 时数据连接的 TLS 需要一端充当客户端，由源服务器的 SSCN ON 指定
+            if not (self.source.tls and self.target.tls):
+                raise Exception("FXP between a TLS and a cleartext session is not supported")
+            with self.source.lock:
+                self._command(self.source, "SSCN ON", "200")
+        if is_dir is None:
+            with self.source.lock:
+                is_dir = self.source._probe_is_dir(source_path)
+        tasks = []
+        if is_dir:
+            self._collect(source_path, target_path, tasks)
+        else:
+            tasks.append((source_path, target_path, self._size(self.source, source_path)))
+        self.total_size += sum(size for _, _, size in tasks)
+        complete = True
+        try:
+            for source_file, target_file, size in tasks:
+                if self.cancelled:
+                    return False
+                result = {"source": source_file, "target": target_file, "bytes": size}
+                try:
+                    ok = self.transfer_file(source_file, target_file, size)
+                    result["status"] = "ok" if ok else "failed"
+                except Exception as e:
+                    result["status"] = "failed"
+                    result["error"] = str(e)
+                complete = complete and result["status"] == "ok"
+                self.results.append(result)
+        finally:
+            if self._monitor_session is not None:
+                try:
+                    self._monitor_session.quit()
+                except OSError:
+                    pass
+                self._monitor_session = None
+        return complete
+
+    def _collect(self, source_dir: str, target_dir: str, tasks: list):
+        self.target.mkdir(target_dir)
+        for entry in self.source.list_entries(source_dir):
+            name = entry[6]
+            source_path = posixpath.join(source_dir, name)
+            target_path = posixpath.join(target_dir, name)
+            if entry[0].startswith("d"):
+                self._collect(source_path, target_path, tasks)
+            else:
+                tasks.append((source_path, target_path, entry[4]))
+
+    @staticmethod
+    def _size(session: FTPClient, path: str) -> int:
+        with session.lock:
+            session.send_cmd(f"SIZE {path}")
+            response = session.control_recv_all()
+        if response.startswith("213"):
+            return int(response.split()[1])
+        return -1
+
+    @staticmethod
+    def _command(session: FTPClient, cmd: str, code: str) -> str:
+        session.send_cmd(cmd)
+        response = session.control_recv_all()
+        if not response.startswith(code):
+            raise Exception(f"{cmd} failed. Server response: {response}")
+        return response
+
+    def _pasv_address(self) -> tuple[str, int]:
+        response = self._command(self.target, "PASV", "227")
+        match = re.search(r"(\d+),(\d+),(\d+),(\d+),(\d+),(\d+)", response)
+        if match is None:
+            raise Exception(f"Invalid PASV response: {response}")
+        numbers = [int(x) for x in match.groups()]
+        host = ".".join(str(x) for x in numbers[:4])
+        # NAT 后面的服务器常报告内网地址，此时改用我们连接它时用的地址
+        public = self._target_address
+        if ipaddress.ip_address(host).is_private and not ipaddress.ip_address(public).is_private:
+            host = public
+        return host, (numbers[4] << 8) + numbers[5]
+
+    def _report(self, path: str, done: int, size: int):
+        if self.on_progress:
+            self.on_progress(path, done, size, self.total_done + done, self.total_size)
+
+    def transfer_file(self, source_path: str, target_path: str, size: int) -> bool:
+        source, target = self.source, self.target
+        with source.lock, target.lock:
+            offset = self._size(target, target_path)
+            if size >= 0 and offset == size:
+                print(f"{target_path} already exists on the target with the same size. Skipping.")
+                self._report(target_path, size, size)
+                self.total_done += size
+                return True
+            if offset < 0 or (size >= 0 and offset > size):
+                offset = 0
+            host, port = self._pasv_address()
+            self._command(source, f"PORT {host.replace('.', ',')},{port >> 8},{port & 0xFF}", "200")
+            if offset > 0:
+                self._command(source, f"REST {offset}", "350")
+                self._command(target, f"REST {offset}", "350")
+            # 有的服务器在数据连接建立之后才回复 150，所以两条命令都发出后再读应答
+            target.send_cmd(f"STOR {target_path}")
+            source.send_cmd(f"RETR {source_path}")
+            finals = self._wait_finals(target_path, offset, size)
+        for name, response in finals.items():
+            print(f"{name}: {response}")
+        ok = all(response.startswith("2") for response in finals.values())
+        if ok:
+            self._report(target_path, size, size)
+            self.total_done += max(size, 0)
+        return ok
+
+    def _wait_finals(self, target_path: str, offset: int, size: int) -> dict:
+        # 同时等待两端的最终应答（跳过 1xx），期间轮询目标文件大小报告进度。
+        # 一端失败或任务被取消时向另一端发送 ABOR
+        sessions = {"source": self.source, "target": self.target}
+        finals = {}
+        aborted = set()
+        abort_deadline = None
+        last_size = offset
+        last_growth = time.monotonic()
+        next_poll = last_growth + self.poll_interval
+        idle_timeout = self.target.transport.idle_timeout
+        if idle_timeout is None:
+            idle_timeout = self.STALL_TIMEOUT
+
+        def abort(reason: str):
+            nonlocal abort_deadline
+            for name, session in sessions.items():
+                if name not in finals and name not in aborted:
+                    print(f"Aborting {name}: {reason}")
+                    session.send_cmd("ABOR")
+                    aborted.add(name)
+                    if abort_deadline is None:
+                        abort_deadline = time.monotonic() + idle_timeout
+
+        while len(finals) < len(sessions):
+            waiting = {session.s: name for name, session in sessions.items() if name not in finals}
+            ready = [sock for sock, name in waiting.items() if sessions[name]._control_pending()]
+            if not ready:
+                ready = select.select(list(waiting), [], [], self.poll_interval)[0]
+            for sock in ready:
+                name = waiting[sock]
+                response = sessions[name].control_recv_all()
+                if response.startswith("1"):
+                    continue
+                finals[name] = response
+                if not response.startswith("2"):
+                    abort(f"{name} replied {response.splitlines()[0]}")
+            if self.cancelled:
+                abort("cancelled")
+            now = time.monotonic()
+            if abort_deadline is not None and now > abort_deadline:
+                # 服务器对 ABOR 没有反应（例如仍在等待数据连接），重建会话以免应答错位
+                for name, session in sessions.items():
+                    if name not in finals:
+                        aborted.discard(name)
+                        session.reconnect()
+                        finals[name] = "426 No reply after ABOR, session reconnected"
+                break
+            if self.monitor and now >= next_poll and len(finals) < len(sessions):
+                next_poll = now + self.poll_interval
+                if self._monitor_session is None:
+                    self._monitor_session = self.target.clone()
+                current = self._size(self._monitor_session, target_path)
+                if current > last_size:
+                    last_size = current
+                    last_growth = now
+                    self._report(target_path, current, size)
+                elif now - last_growth > idle_timeout:
+                    abort("transfer stalled")
+                    last_growth = now  # 已中止，等待两端应答
+        for name in aborted:
+            self._drain(sessions[name])
+        return finals
 
-client.upload("pdm.lock")
+    @staticmethod
+    def _drain(session: FTPClient, timeout: float = 1.0):
+        # 中止后服务器可能在传输应答之外再回复一次 ABOR，读掉以免错位
+        while session._control_readable(timeout):
+            print(session.control_recv_all())
@@ -1,3 +1,8 @@
+import time
+
+# 启动计时：(阶段, 结束时间点)，窗口首次显示后汇总成启动报告
+_startup_marks = [("启动", time.perf_counter())]
+
 from PyQt5.QtWidgets import (
     QApplication,
     QWidget,
@@ -17,38 +22,991 @@ from PyQt5.QtWidgets import (
     QMessageBox,
     QFileDialog,
     QMenu,
-    QTextEdit,
+    QListView,
+    QComboBox,
     QDialog,
+    QTreeWidget,
+    QTreeWidgetItem,
+)
+from PyQt5.QtCore import (
+    Qt,
+    pyqtSignal,
+    QDir,
+    QModelIndex,
+    QUrl,
+    QAbstractItemModel,
+    QAbstractListModel,
+    QSortFilterProxyModel,
+    QTimer,
+    QSettings,
 )
-from PyQt5.QtCore import Qt, pyqtSignal, QDir, QModelIndex, QDateTime,QUrl
-from PyQt5.QtGui import QIcon, QStandardItemModel, QStandardItem,QDesktopServices
+from PyQt5.QtGui import QIcon, QDesktopServices, QColor
+from array import array
+from datetime import datetime
+import fnmatch
 import os
+import posixpath
+import re
 import sys
-import calendar
+import threading
+
+from ftp_listing import parse_listing
+
+# 后端 FTP 客户端（ftp_client）和本地索引（local_index）在连接、搜索时才导入，
+# 不拖慢窗口的首次显示
 
+def startup_mark(stage):
+    _startup_marks.append((stage, time.perf_counter()))
+
+
+def startup_report():
+    # 各阶段耗时和总耗时（毫秒）
+    stages = ", ".join(
+        f"{stage} {1000 * (end - start):.0f}ms"
+        for (_, start), (stage, end) in zip(_startup_marks, _startup_marks[1:])
+    )
+    total = 1000 * (_startup_marks[-1][1] - _startup_marks[0][1])
+    return f"启动耗时 {total:.0f}ms（{stages}）"
 
-# 导入后端 FTP 客户端
-from back import FTPClient as BackendFTPClient
 
 def resource_path(relative_path):
     base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base_path, relative_path)
 
 
+_icon_cache = {}
+
+
+def cached_icon(relative_path):
+    # 图标首次使用时才从磁盘加载，之后所有行共享同一个 QIcon
+    icon = _icon_cache.get(relative_path)
+    if icon is None:
+        icon = _icon_cache[relative_path] = QIcon(resource_path(relative_path))
+    return icon
+
+
+SETTINGS_ORGANIZATION = "FTPClient"
+SETTINGS_APPLICATION = "ftp_front"
+
+REMOTE_HEADERS = ["名称", "大小", "修改日期和时间", "类型和权限", "硬链接数", "所有者", "所有组"]
+
+
+FILE_TYPES = {
+    'txt': 'Text File',
+    'pdf': 'PDF Document',
+    'docx': 'Word Document',
+    'xlsx': 'Excel Spreadsheet',
+    'pptx': 'PowerPoint Presentation',
+    'jpg': 'JPEG Image',
+    'jpeg': 'JPEG Image',
+    'png': 'PNG Image',
+    'gif': 'GIF Image',
+    'bmp': 'Bitmap Image',
+    'tiff': 'TIFF Image',
+    'svg': 'Scalable Vector Graphics',
+    'log': 'Log File',
+    'xml': 'XML File',
+    'html': 'HTML Document',
+    'css': 'CSS File',
+    'js': 'JavaScript File',
+    'json': 'JSON File',
+    'zip': 'ZIP Archive',
+    'rar': 'RAR Archive',
+    '7z': '7z Archive',
+    'tar': 'TAR Archive',
+    'wav': 'WAV Audio',
+    'mp3': 'MP3 Audio',
+    'avi': 'AVI Video',
+    'mp4': 'MP4 Video',
+    'mov': 'QuickTime Video',
+    'exe': 'Executable File',
+    'dll': 'Dynamic Link Library',
+    'iso': 'ISO Disk Image',
+    'bak': 'Backup File',
+    'sln': 'Solution File',
+    'csv': 'Comma-Separated Values',
+    'yml': 'YAML File',
+    'py': 'Python Script',
+    'c': 'C Source File',
+    'md': 'Markdown Document',
+    'sh': 'Shell Script',
+    'gdb': 'GDB Script',
+    'h': 'C/C++ Header File',
+    'S': 'Assembly Source File',
+    # 可以继续添加更多的文件类型和扩展名
+}
+
+_file_type_cache = {}  # 扩展名（原始大小写）-> 类型名称
+
+
+def file_type(name):
+    # 按扩展名返回文件类型。排序时每行都会调用，同一扩展名只换算一次
+    extension = name.rpartition(".")[2] if "." in name else "unknown"
+    kind = _file_type_cache.get(extension)
+    if kind is None:
+        kind = _file_type_cache[extension] = FILE_TYPES.get(extension.lower(), "Unknown File Type")
+    return kind
+
+
+class RemoteDirNode:
+    # 一个远程目录的条目，按列存放在紧凑数组中，而不是每个单元格一个 QStandardItem
+    __slots__ = (
+        "parent", "row", "path", "names", "permissions", "num_links", "owners",
+        "groups", "sizes", "mod_times", "children", "listed", "fetched", "rows",
+    )
+
+    def __init__(self, parent=None, row=0, path=""):
+        self.parent = parent
+        self.row = row
+        self.path = path
+        self.children = {}  # 行号 -> 已展开的子目录节点
+        self.listed = False  # 是否已从服务器取得列表
+        self.fetched = 0  # 已暴露给视图的行数
+        self.set_entries([])
+
+    def set_entries(self, entries):
+        # entries 为 parse_listing 返回的元组列表
+        self.permissions = [sys.intern(e[0]) for e in entries]
+        self.num_links = array("l", (e[1] for e in entries))
+        self.owners = [sys.intern(e[2]) for e in entries]
+        self.groups = [sys.intern(e[3]) for e in entries]
+        self.sizes = array("q", (e[4] for e in entries))
+        self.mod_times = [e[5] for e in entries]
+        self.names = [e[6] for e in entries]
+        self.children = {}
+        self.fetched = 0
+        self.rows = None  # 名称 -> 行号，增量刷新时按需建立
+
+    def row_index(self):
+        if self.rows is None:
+            self.rows = {name: row for row, name in enumerate(self.names)}
+        return self.rows
+
+    def append_entries(self, entries):
+        first = len(self.names)
+        self.permissions.extend(sys.intern(e[0]) for e in entries)
+        self.num_links.extend(e[1] for e in entries)
+        self.owners.extend(sys.intern(e[2]) for e in entries)
+        self.groups.extend(sys.intern(e[3]) for e in entries)
+        self.sizes.extend(e[4] for e in entries)
+        self.mod_times.extend(e[5] for e in entries)
+        self.names.extend(e[6] for e in entries)
+        if self.rows is not None:
+            for row, e in enumerate(entries, first):
+                self.rows[e[6]] = row
+
+    def set_row(self, row, entry):
+        self.permissions[row] = sys.intern(entry[0])
+        self.num_links[row] = entry[1]
+        self.owners[row] = sys.intern(entry[2])
+        self.groups[row] = sys.intern(entry[3])
+        self.sizes[row] = entry[4]
+        self.mod_times[row] = entry[5]
+        if not self.is_dir(row):
+            self.children.pop(row, None)  # 模型应先通过 set_file_row 通知视图
+
+    @staticmethod
+    def entry_values(entry):
+        # 条目元组 -> 与 columns() 顺序一致的各列的值
+        return (sys.intern(entry[0]), entry[1], sys.intern(entry[2]), sys.intern(entry[3]),
+                entry[4], entry[5], entry[6])
+
+    def columns(self):
+        return (self.permissions, self.num_links, self.owners, self.groups,
+                self.sizes, self.mod_times, self.names)
+
+    def insert_row(self, row, values, child=None):
+        for column, value in zip(self.columns(), values):
+            column.insert(row, value)
+        # 其后已展开的子目录节点行号后移
+        children = {}
+        for child_row, node in self.children.items():
+            node.row = child_row + 1 if child_row >= row else child_row
+            children[node.row] = node
+        if child is not None:
+            child.row = row
+            children[row] = child
+        self.children = children
+        self.rows = None
+
+    def sort(self, key, reverse):
+        # 按类型化的键重排各列数组，返回 旧行号 -> 新行号 的映射
+        order = sorted(range(len(self.names)), key=key, reverse=reverse)
+        self.permissions = [self.permissions[i] for i in order]
+        self.num_links = array("l", (self.num_links[i] for i in order))
+        self.owners = [self.owners[i] for i in order]
+        self.groups = [self.groups[i] for i in order]
+        self.sizes = array("q", (self.sizes[i] for i in order))
+        self.mod_times = [self.mod_times[i] for i in order]
+        self.names = [self.names[i] for i in order]
+        new_rows = [0] * len(order)
+        for new_row, old_row in enumerate(order):
+            new_rows[old_row] = new_row
+        children = {}
+        for old_row, node in self.children.items():
+            node.row = new_rows[old_row]
+            children[node.row] = node
+        self.children = children
+        self.rows = None
+        return new_rows
+
+    def remove_row(self, row):
+        # 返回被移除行的各列的值和已展开的子目录节点，以便移动到别处
+        values = tuple(column.pop(row) for column in self.columns())
+        removed = self.children.get(row)
+        # 其后已展开的子目录节点行号前移
+        children = {}
+        for child_row, node in self.children.items():
+            if child_row != row:
+                node.row = child_row - 1 if child_row > row else child_row
+                children[node.row] = node
+        self.children = children
+        self.rows = None
+        return values, removed
+
+    def is_dir(self, row):
+        return self.permissions[row].startswith("d")
+
+    def child_path(self, row):
+        return f"{self.path}/{self.names[row]}" if self.path else self.names[row]
+
+    def child(self, row):
+        node = self.children.get(row)
+        if node is None and self.is_dir(row):
+            node = self.children[row] = RemoteDirNode(self, row, self.child_path(row))
+        return node
+
+
+class RemoteTreeModel(QAbstractItemModel):
+    # 远程文件树模型：按批次把行暴露给视图（canFetchMore/fetchMore），
+    # 子目录在展开时才通过 loader 向服务器请求列表
+    FETCH_BATCH = 1000
+
+    load_failed = pyqtSignal(str, str)
+
+    def __init__(self, loader, file_type, parent=None):
+        super().__init__(parent)
+        self.loader = loader  # loader(path) -> 解析后的条目列表
+        self.file_type = file_type
+        self.root = RemoteDirNode()
+        self.root.listed = True
+        self.sort_column = None  # 当前排序列，新加载的目录按同样的方式排序
+        self.sort_order = Qt.AscendingOrder
+
+    def clear(self):
+        self.set_entries([])
+
+    def set_entries(self, entries):
+        self.beginResetModel()
+        self.root = RemoteDirNode()
+        self.root.set_entries(entries)
+        self.root.listed = True
+        if self.sort_column is not None:
+            self.sort_node(self.root)
+        self.endResetModel()
+
+    def sort_key(self, node, column):
+        # 返回按列的类型化排序键：数值大小、真实时间，而不是格式化后的文本
+        if column == 0:
+            return lambda row: (not node.is_dir(row), node.names[row].lower())
+        if column == 1:
+            return node.sizes.__getitem__
+        if column == 2:
+            return node.mod_times.__getitem__  # 规范化的 "YYYY/MM/DD HH:MM" 按字符串即按时间排序
+        if column == 3:
+            return lambda row: "" if node.is_dir(row) else self.file_type(node.names[row])
+        if column == 4:
+            return node.num_links.__getitem__
+        if column == 5:
+            return node.owners.__getitem__
+        return node.groups.__getitem__
+
+    def sort_node(self, node, row_maps=None, recursive=True):
+        new_rows = node.sort(
+            self.sort_key(node, self.sort_column), self.sort_order == Qt.DescendingOrder
+        )
+        if row_maps is not None:
+            row_maps[id(node)] = new_rows
+        if recursive:
+            for child in node.children.values():
+                if child.listed:
+                    self.sort_node(child, row_maps)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # 在本地对已加载的所有目录排序，不访问服务器
+        if not 0 <= column < len(REMOTE_HEADERS):
+            return
+        self.sort_column = column
+        self.sort_order = order
+        self.resort(self.root, recursive=True)
+
+    def resort(self, node, recursive):
+        self.layoutAboutToBeChanged.emit()
+        row_maps = {}
+        self.sort_node(node, row_maps, recursive)
+        for index in self.persistentIndexList():
+            node = index.internalPointer()
+            new_rows = row_maps.get(id(node))
+            if new_rows is None:
+                continue  # 未重排的目录
+            new_row = new_rows[index.row()]
+            if new_row < node.fetched:
+                self.changePersistentIndex(index, self.createIndex(new_row, index.column(), node))
+            else:
+                self.changePersistentIndex(index, QModelIndex())
+        self.layoutChanged.emit()
+
+    def fetch_all(self):
+        # 筛选时需要根目录的全部行都参与匹配
+        node = self.root
+        if node.fetched < len(node.names):
+            self.beginInsertRows(QModelIndex(), node.fetched, len(node.names) - 1)
+            node.fetched = len(node.names)
+            self.endInsertRows()
+
+    # 增量刷新时新条目超过这个数目就追加后整体重排根目录，而不是逐个插入
+    INSERT_SORTED_LIMIT = 64
+
+    def update_entries(self, removed_names, changed_entries):
+        # 把两次列表之间的差异应用到根目录：删除消失的条目、原地更新变化的条目、
+        # 把新条目插入到按当前排序应在的位置。不重置模型，也不重排整个目录和其他已加载的目录，
+        # 视图的滚动位置、选择和已展开的子目录得以保留。
+        node = self.root
+        parent = QModelIndex()
+        rows = node.row_index()
+        changed_names = {e[6] for e in changed_entries}
+        key = self.sort_key(node, self.sort_column) if self.sort_column is not None else None
+        last_column = len(REMOTE_HEADERS) - 1
+        taken = {}  # 行号 -> 是否重新插入（排序位置变化的条目）；否则为删除
+        inserts = []  # (各列的值, 子目录节点)
+        for entry in changed_entries:
+            row = rows.get(entry[6])
+            if row is None:
+                inserts.append((RemoteDirNode.entry_values(entry), None))
+                continue
+            old_key = key(row) if key else None
+            if entry[0].startswith("d"):
+                node.set_row(row, entry)
+            else:
+                self.set_file_row(node, row, entry)
+            if key is not None and key(row) != old_key:
+                taken[row] = True
+            elif row < node.fetched:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+        for name in removed_names:
+            if name in rows and name not in changed_names:
+                taken[rows[name]] = False
+
+        for row in sorted(taken, reverse=True):
+            values, child = self.remove_row(node, parent, row)
+            if taken[row]:
+                inserts.append((values, child))
+
+        if key is None or len(inserts) > self.INSERT_SORTED_LIMIT:
+            self.append_rows(node, parent, inserts)
+            if key is not None:
+                self.resort(node, recursive=False)
+        else:
+            for values, child in inserts:
+                self.insert_sorted(node, parent, values, child)
+
+    def set_file_row(self, node, row, entry):
+        # 目录变成了文件：已展开的子目录的行要先通知视图移除，并在移除期间就把该行改为文件，
+        # 否则视图会在 endRemoveRows 时对仍是目录的该行再次 fetchMore
+        child = node.children.get(row)
+        if child is None or row >= node.fetched or not child.fetched:
+            node.set_row(row, entry)
+            return
+        self.beginRemoveRows(self.createIndex(row, 0, node), 0, child.fetched - 1)
+        child.fetched = 0
+        node.set_row(row, entry)
+        self.endRemoveRows()
+
+    def remove_row(self, node, parent, row):
+        if row >= node.fetched:
+            return node.remove_row(row)
+        self.beginRemoveRows(parent, row, row)
+        taken = node.remove_row(row)
+        node.fetched -= 1
+        self.endRemoveRows()
+        return taken
+
+    def append_rows(self, node, parent, rows):
+        if not rows:
+            return
+        first = len(node.names)
+        # 尚未全部暴露给视图时只追加数据，由 fetchMore 在之后暴露
+        exposed = node.fetched == first
+        if exposed:
+            self.beginInsertRows(parent, first, first + len(rows) - 1)
+        for row, (values, child) in enumerate(rows, first):
+            node.insert_row(row, values, child)
+        if exposed:
+            node.fetched += len(rows)
+            self.endInsertRows()
+
+    def insert_sorted(self, node, parent, values, child=None):
+        last = len(node.names)
+        # 先暂放在末尾（尚未暴露给视图）以便用排序键与已有行比较，求出位置后再正式插入
+        node.insert_row(last, values)
+        position = self.sorted_position(node, last)
+        node.remove_row(last)
+        if position < node.fetched or node.fetched == last:
+            self.beginInsertRows(parent, position, position)
+            node.insert_row(position, values, child)
+            node.fetched += 1
+            self.endInsertRows()
+        else:
+            node.insert_row(position, values, child)
+
+    def sorted_position(self, node, row):
+        # 在已排序的 [0, row) 中二分查找 row 应在的位置，键相等时排在已有行之后
+        key = self.sort_key(node, self.sort_column)
+        target = key(row)
+        descending = self.sort_order == Qt.DescendingOrder
+        low, high = 0, row
+        while low < high:
+            middle = (low + high) // 2
+            current = key(middle)
+            if (target > current) if descending else (target < current):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def node_for(self, index):
+        if not index.isValid():
+            return self.root
+        return index.internalPointer().child(index.row())
+
+    def entry_name(self, index):
+        return index.internalPointer().names[index.row()]
+
+    def entry_path(self, index):
+        return index.internalPointer().child_path(index.row())
+
+    def entry_is_dir(self, index):
+        return index.internalPointer().is_dir(index.row())
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node_for(parent)
+        if node is None or not 0 <= row < node.fetched or not 0 <= column < len(REMOTE_HEADERS):
+            return QModelIndex()
+        return self.createIndex(row, column, node)
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        node = index.internalPointer()
+        if node is self.root:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node.parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        node = self.node_for(parent)
+        return node.fetched if node else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(REMOTE_HEADERS)
+
+    def hasChildren(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return False
+        node = self.node_for(parent)
+        if node is None:
+            return False
+        # 未列出的目录先显示展开箭头，展开时再加载
+        return not node.listed or len(node.names) > 0
+
+    def canFetchMore(self, parent):
+        node = self.node_for(parent)
+        if node is None:
+            return False
+        return not node.listed or node.fetched < len(node.names)
+
+    def fetchMore(self, parent):
+        node = self.node_for(parent)
+        if node is None:
+            return
+        if not node.listed:
+            node.listed = True
+            try:
+                node.set_entries(self.loader(node.path))
+            except Exception as e:
+                # Qt 虚函数中不能抛出异常，改为通过信号报告
+                self.load_failed.emit(node.path, str(e))
+                return
+            if self.sort_column is not None:
+                self.sort_node(node)
+        remaining = len(node.names) - node.fetched
+        if remaining <= 0:
+            return
+        count = min(remaining, self.FETCH_BATCH)
+        self.beginInsertRows(parent, node.fetched, node.fetched + count - 1)
+        node.fetched += count
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return REMOTE_HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        row = index.row()
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return node.names[row]
+            if column == 1:
+                size = node.sizes[row]
+                return f"{size} B" if size != 4096 else str(size)
+            if column == 2:
+                return node.mod_times[row]
+            if column == 3:
+                return "File Folder" if node.is_dir(row) else self.file_type(node.names[row])
+            if column == 4:
+                return str(node.num_links[row])
+            if column == 5:
+                return node.owners[row]
+            if column == 6:
+                return node.groups[row]
+        elif role == Qt.DecorationRole and column == 0:
+            return cached_icon('icons\\folder.png' if node.is_dir(row) else 'icons\\file.png')
+        return None
+
+
+class RemoteFilterProxyModel(QSortFilterProxyModel):
+    # 远程列表的名称筛选（子串或通配符），排序转交给 RemoteTreeModel 在本地完成
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pattern = ""
+
+    def set_name_filter(self, text):
+        self.pattern = text.strip().lower()
+        if self.pattern:
+            self.sourceModel().fetch_all()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        # 只筛选当前目录这一层，已展开的子目录内容照常显示
+        if not self.pattern or source_parent.isValid():
+            return True
+        name = self.sourceModel().root.names[source_row].lower()
+        if "*" in self.pattern or "?" in self.pattern:
+            return fnmatch.fnmatchcase(name, self.pattern)
+        return self.pattern in name
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sourceModel().sort(column, order)
+
+
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+LOG_CAPACITY = 10000  # 日志最多保留的条数
+LOG_FLUSH_INTERVAL_MS = 100
+
+
+class LogModel(QAbstractListModel):
+    # 日志环形缓冲，最多保留 capacity 条，超出时丢弃最早的。append() 可在任意线程调用，
+    # 只放入待写队列；GUI 线程的定时器每隔 LOG_FLUSH_INTERVAL_MS 把积累的一批写入模型，
+    # 视图每批只更新一次，而不是每条消息重新布局
+    LEVEL_COLORS = {"DEBUG": "#808080", "WARNING": "#b36b00", "ERROR": "#c00000"}
+
+    def __init__(self, capacity=LOG_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        # 环形缓冲：最早的一条在 entries[head]，共 count 条。满了之后新条目覆盖最早的，
+        # 按行号取条目是 O(1)
+        self.entries = []  # (时间, 级别, 消息)
+        self.head = 0
+        self.count = 0
+        self.dropped = 0  # 因超出容量被丢弃的条数
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._colors = {level: QColor(color) for level, color in self.LEVEL_COLORS.items()}
+        self._timer = QTimer(self)
+        self._timer.setInterval(LOG_FLUSH_INTERVAL_MS)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    @staticmethod
+    def format_entry(entry):
+        timestamp, level, message = entry
+        return f"[{timestamp}] [{level}] {message}"
+
+    def append(self, message, level="INFO"):
+        entry = (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), level, str(message))
+        with self._pending_lock:
+            self._pending.append(entry)
+
+    def flush(self):
+        with self._pending_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+        if len(batch) > self.capacity:
+            self.dropped += len(batch) - self.capacity
+            batch = batch[-self.capacity:]
+        overflow = self.count + len(batch) - self.capacity
+        if overflow > 0:
+            # 最早的几条只是移出有效范围，位置由随后插入的条目覆盖
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            self.head = (self.head + overflow) % self.capacity
+            self.count -= overflow
+            self.dropped += overflow
+            self.endRemoveRows()
+        first = self.count
+        self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+        for entry in batch:
+            position = (self.head + self.count) % self.capacity
+            if position < len(self.entries):
+                self.entries[position] = entry
+            else:
+                self.entries.append(entry)
+            self.count += 1
+        self.endInsertRows()
+
+    def entry(self, row):
+        return self.entries[(self.head + row) % self.capacity]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.count
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entry(index.row())
+        if role == Qt.DisplayRole:
+            # 列表行高固定，多行消息（如异常堆栈）显示在一行内，完整内容见提示
+            return self.format_entry(entry).replace("\n", " ⏎ ")
+        if role == Qt.ToolTipRole:
+            return entry[2]
+        if role == Qt.ForegroundRole:
+            return self._colors.get(entry[1])
+        return None
+
+    def export(self, path):
+        self.flush()
+        with open(path, "w", encoding="utf-8") as f:
+            if self.dropped:
+                f.write(f"# 较早的 {self.dropped} 条日志已超出保留上限 {self.capacity}，未包含在内\n")
+            for row in range(self.count):
+                f.write(self.format_entry(self.entry(row)) + "\n")
+
+
+class LogFilterProxyModel(QSortFilterProxyModel):
+    # 按最低级别筛选日志，不复制数据
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.min_level = 0
+
+    def set_min_level(self, level):
+        self.min_level = LOG_LEVELS.index(level)
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.min_level == 0:
+            return True
+        level = self.sourceModel().entry(source_row)[1]
+        return LOG_LEVELS.index(level) >= self.min_level
+
+
+class RemoteSearchDialog(QDialog):
+    # 远程递归搜索窗口：后台线程用多个会话遍历服务器，结果逐条显示，可随时取消
+    result_found = pyqtSignal(str, str, str)
+    search_finished = pyqtSignal(int, int)
+    open_result = pyqtSignal(str)
+
+    def __init__(self, backend_ftp_client, root, listing_cache, pattern="", parent=None):
+        super().__init__(parent)
+        self.backend_ftp_client = backend_ftp_client
+        self.root = root
+        self.listing_cache = listing_cache
+        self.search = None
+        self.setWindowTitle("搜索远程文件")
+        self.resize(900, 600)
+
+        self.pattern_input = QLineEdit(self)
+        self.pattern_input.setPlaceholderText("文件名（通配符，如 *.log）")
+        self.pattern_input.setText(pattern)
+        self.regex_checkbox = QCheckBox("正则表达式", self)
+        self.min_size_input = QLineEdit(self)
+        self.min_size_input.setPlaceholderText("最小字节数")
+        self.max_size_input = QLineEdit(self)
+        self.max_size_input.setPlaceholderText("最大字节数")
+        self.newer_input = QLineEdit(self)
+        self.newer_input.setPlaceholderText("修改时间晚于 YYYY-MM-DD")
+        self.start_button = QPushButton("开始", self)
+        self.cancel_button = QPushButton("取消", self)
+        self.cancel_button.setEnabled(False)
+
+        criteria_layout = QHBoxLayout()
+        criteria_layout.addWidget(self.pattern_input)
+        criteria_layout.addWidget(self.regex_checkbox)
+        criteria_layout.addWidget(self.min_size_input)
+        criteria_layout.addWidget(self.max_size_input)
+        criteria_layout.addWidget(self.newer_input)
+        criteria_layout.addWidget(self.start_button)
+        criteria_layout.addWidget(self.cancel_button)
+
+        self.results = QTreeWidget(self)
+        self.results.setHeaderLabels(["路径", "大小", "修改日期和时间"])
+        self.results.setUniformRowHeights(True)
+        self.results.setRootIsDecorated(False)
+        self.status_label = QLabel(f"搜索范围: {root}", self)
+
+        layout = QVBoxLayout()
+        layout.addLayout(criteria_layout)
+        layout.addWidget(self.results)
+        layout.addWidget(self.status_label)
+        self.setLayout(layout)
+
+        self.start_button.clicked.connect(self.start_search)
+        self.cancel_button.clicked.connect(self.cancel_search)
+        self.result_found.connect(self.add_result)
+        self.search_finished.connect(self.on_search_finished)
+        self.results.itemDoubleClicked.connect(
+            lambda item, column: self.open_result.emit(item.text(0))
+        )
+
+    def start_search(self):
+        try:
+            min_size = int(self.min_size_input.text()) if self.min_size_input.text() else None
+            max_size = int(self.max_size_input.text()) if self.max_size_input.text() else None
+            newer_than = (
+                datetime.strptime(self.newer_input.text(), "%Y-%m-%d")
+                if self.newer_input.text() else None
+            )
+            from ftp_client import RemoteSearch
+
+            self.search = RemoteSearch(
+                self.backend_ftp_client,
+                self.root,
+                pattern=self.pattern_input.text().strip() or None,
+                regex=self.regex_checkbox.isChecked(),
+                min_size=min_size,
+                max_size=max_size,
+                newer_than=newer_than,
+                listing_cache=self.listing_cache,
+                on_match=self.on_match,
+            )
+        except ValueError as e:
+            QMessageBox.warning(self, "提示", f"搜索条件无效: {e}")
+            return
+        self.results.clear()
+        self.start_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.status_label.setText("正在搜索...")
+        threading.Thread(target=self._run_search, args=(self.search,), daemon=True).start()
+
+    def _run_search(self, search):
+        matches = search.run()
+        self.search_finished.emit(len(matches), len(search.errors))
+
+    def on_match(self, path, entry):
+        # 在搜索线程中调用，通过信号把结果交给界面线程
+        self.result_found.emit(path, str(entry[4]), entry[5])
+
+    def add_result(self, path, size, mod_time_str):
+        self.results.addTopLevelItem(QTreeWidgetItem([path, size, mod_time_str]))
+        self.status_label.setText(f"正在搜索... 已找到 {self.results.topLevelItemCount()} 项")
+
+    def cancel_search(self):
+        if self.search:
+            self.search.cancel()
+
+    def on_search_finished(self, count, errors):
+        self.start_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        state = "已取消" if self.search and self.search.cancelled else "完成"
+        message = f"搜索{state}，找到 {count} 项"
+        if errors:
+            message += f"，{errors} 个目录无法列出"
+        self.status_label.setText(message)
+
+    def closeEvent(self, event):
+        self.cancel_search()
+        event.accept()
+
+
+class LocalSearchDialog(QDialog):
+    # 本地文件搜索窗口：查询直接在内存索引上进行，输入时即时显示排序后的结果；
+    # 索引在后台线程中构建或增量刷新，完成后自动重新查询
+    index_updated = pyqtSignal()
+    open_result = pyqtSignal(str)
+
+    MODES = [("子串", "substring"), ("通配符", "glob"), ("正则表达式", "regex")]
+    RESULT_LIMIT = 500
+
+    def __init__(self, index, query="", parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.setWindowTitle("搜索本地文件")
+        self.resize(900, 600)
+
+        self.query_input = QLineEdit(self)
+        self.query_input.setPlaceholderText("文件名")
+        self.query_input.setText(query)
+        self.mode_combo = QComboBox(self)
+        for label, _ in self.MODES:
+            self.mode_combo.addItem(label)
+        self.refresh_button = QPushButton("刷新索引", self)
+
+        criteria_layout = QHBoxLayout()
+        criteria_layout.addWidget(self.query_input)
+        criteria_layout.addWidget(self.mode_combo)
+        criteria_layout.addWidget(self.refresh_button)
+
+        self.results = QTreeWidget(self)
+        self.results.setHeaderLabels(["路径", "大小", "修改日期和时间"])
+        self.results.setUniformRowHeights(True)
+        self.results.setRootIsDecorated(False)
+        self.index_label = QLabel(self)
+        self.status_label = QLabel(self)
+
+        status_layout = QHBoxLayout()
+        status_layout.addWidget(self.status_label)
+        status_layout.addStretch()
+        status_layout.addWidget(self.index_label)
+
+        layout = QVBoxLayout()
+        layout.addLayout(criteria_layout)
+        layout.addWidget(self.results)
+        layout.addLayout(status_layout)
+        self.setLayout(layout)
+
+        self.query_input.textChanged.connect(self.run_query)
+        self.mode_combo.currentIndexChanged.connect(self.run_query)
+        self.refresh_button.clicked.connect(self.refresh_index)
+        self.index_updated.connect(self.on_index_updated)
+        self.results.itemDoubleClicked.connect(
+            lambda item, column: self.open_result.emit(item.data(0, Qt.UserRole))
+        )
+
+        # 已有索引时先用它立即回答，同时在后台增量刷新
+        self.run_query()
+        self.refresh_index()
+
+    def refresh_index(self):
+        self.refresh_button.setEnabled(False)
+        action = "刷新" if self.index.ready else "建立"
+        self.index_label.setText(f"正在{action}索引: {self.index.root}")
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.index.refresh()
+        finally:
+            self.index_updated.emit()
+
+    def on_index_updated(self):
+        self.refresh_button.setEnabled(True)
+        snapshot = self.index.snapshot
+        if snapshot is None:
+            self.index_label.setText(f"无法建立索引: {self.index.root}")
+            return
+        message = (
+            f"索引 {self.index.root}: {len(snapshot)} 项，"
+            f"重新列出 {self.index.listed_dirs} 个目录，用时 {self.index.scan_seconds:.2f} 秒"
+        )
+        if self.index.errors:
+            message += f"，{self.index.errors} 个目录无法访问"
+        self.index_label.setText(message)
+        self.run_query()
+
+    def run_query(self):
+        query = self.query_input.text().strip()
+        mode = self.MODES[self.mode_combo.currentIndex()][1]
+        self.results.clear()
+        if not query:
+            self.status_label.setText("")
+            return
+        if not self.index.ready:
+            self.status_label.setText("正在建立索引...")
+            return
+        try:
+            total, matches = self.index.search(query, mode, self.RESULT_LIMIT)
+        except re.error as e:
+            self.status_label.setText(f"正则表达式无效: {e}")
+            return
+        items = []
+        for path, is_dir, size, mtime in matches:
+            item = QTreeWidgetItem([
+                path,
+                "" if is_dir else str(size),
+                datetime.fromtimestamp(mtime).strftime("%Y/%m/%d %H:%M"),
+            ])
+            item.setData(0, Qt.UserRole, path)
+            items.append(item)
+        self.results.addTopLevelItems(items)
+        message = f"找到 {total} 项"
+        if total > len(matches):
+            message += f"，显示前 {len(matches)} 项"
+        self.status_label.setText(message)
+
+
 class FTPClient(QWidget):
     # 定义信号，用于在连接成功或失败时通知界面更新
     connection_status_signal = pyqtSignal(str)
+    # 后端会话监控线程报告连接断开/恢复时发出，跨线程安全地更新界面
+    session_state_signal = pyqtSignal(bool, str)
 
     def __init__(self):
         super().__init__()
         self.initUI()
         self.backend_ftp_client = None  # 后端 FTP 客户端实例
-        self.remote_files_info = []  # 存储远程文件的信息
+        # 上一次列表的目录和原始行，用于增量刷新（未变化的行无需重新解析）
+        self.remote_listing_dir = None
+        self.remote_listing_lines = set()
+        # 目录绝对路径 -> 原始列表文本，远程搜索时复用
+        self.remote_listing_cache = {}
+        self.local_index = None  # 本地文件索引，首次搜索时在后台建立
         self.is_connected = False  # 连接状态
-        self.setWindowIcon(QIcon(resource_path("icons\\ftp.ico")))
+        self.startup_finished = False
+        startup_mark("创建界面")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.startup_finished:
+            self.startup_finished = True
+            # 等首次显示的事件处理完再做剩余的初始化
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        startup_mark("首次显示")
+        self.load_icons()
+        startup_mark("图标")
+        self.init_local_model()
+        startup_mark("本地目录")
+        self.log(startup_report())
+
+    def load_icons(self):
+        self.setWindowIcon(cached_icon("icons\\ftp.ico"))
+        for target, path in self.deferred_icons:
+            target.setIcon(cached_icon(path))
+        self.deferred_icons = []
+
+    def init_local_model(self):
+        # 只监视并填充起始目录：上次关闭时所在的本地目录，不存在时为主目录
+        start_dir = QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION).value("local/last_dir", "", str)
+        if not start_dir or not os.path.isdir(start_dir):
+            start_dir = QDir.homePath()
+        start_index = self.local_model.setRootPath(start_dir)
+        self.local_view.setCurrentIndex(start_index)
+        self.local_view.expand(start_index)
+        self.local_view.scrollTo(start_index)
 
 
     def initUI(self):
+        # 按钮和工具栏的图标在首次显示之后才加载，见 load_icons
+        self.deferred_icons = []  # (控件或 QAction, 图标路径)
+        self.log_model = LogModel(parent=self)
         self.setWindowTitle("FTP 客户端")
         self.setGeometry(500, 200, 1500, 1000)  # 增大窗口尺寸以显示日志
 
@@ -75,11 +1033,14 @@ class FTPClient(QWidget):
         self.show_password_checkbox = QCheckBox("显示密码", self)
         self.show_password_checkbox.stateChanged.connect(self.toggle_password_visibility)
 
+        self.tls_checkbox = QCheckBox("FTPS", self)
+        self.tls_checkbox.setToolTip("使用显式 FTPS（AUTH TLS）加密控制和数据连接")
+
         self.connect_btn = QPushButton("连接", self)
-        self.connect_btn.setIcon(QIcon(resource_path('icons\\connect.png')))  # 添加图标
+        self.deferred_icons.append((self.connect_btn, 'icons\\connect.png'))
 
         self.quit_btn = QPushButton("断开", self)
-        self.quit_btn.setIcon(QIcon(resource_path('icons\\quit.png')))
+        self.deferred_icons.append((self.quit_btn, 'icons\\quit.png'))
 
         top_layout = QHBoxLayout()
         top_layout.addWidget(self.host_input)
@@ -87,6 +1048,7 @@ class FTPClient(QWidget):
         top_layout.addLayout(self.username_layout)
         top_layout.addWidget(self.pass_input)
         top_layout.addWidget(self.show_password_checkbox)
+        top_layout.addWidget(self.tls_checkbox)
         top_layout.addWidget(self.connect_btn)
         top_layout.addWidget(self.quit_btn)
 
@@ -94,18 +1056,21 @@ class FTPClient(QWidget):
         self.search_label = QLabel("搜索: ", self)
         self.search_input = QLineEdit(self)
         self.search_button = QPushButton("搜索", self)
-        self.search_button.setIcon(QIcon(resource_path('icons\\search.png')))
+        self.deferred_icons.append((self.search_button, 'icons\\search.png'))
+        self.remote_search_button = QPushButton("搜索远程", self)
+        self.deferred_icons.append((self.remote_search_button, 'icons\\search.png'))
 
         search_layout = QHBoxLayout()
         search_layout.addWidget(self.search_label)
         search_layout.addWidget(self.search_input)
         search_layout.addWidget(self.search_button)
+        search_layout.addWidget(self.remote_search_button)
 
         
         # 文件浏览区域
         self.local_model = QFileSystemModel()
-        # 空字符串表示根路径，展示整个文件系统
-        self.local_model.setRootPath("")
+        # 根路径在窗口显示后由 init_local_model 设置为上次或主目录，
+        # 不再以 "" 监视并填充整个文件系统（挂载点多时很慢）
         self.local_view = QTreeView()
         self.local_view.setModel(self.local_model)
         # 不需要手动设置根索引，以下行应该被移除或注释掉
@@ -113,16 +1078,31 @@ class FTPClient(QWidget):
         self.local_view.setSortingEnabled(True)  # 启用排序功能
 
         self.remote_view = QTreeView()
-        self.model = QStandardItemModel()
-        self.remote_view.setModel(self.model)
-        self.model.setHorizontalHeaderLabels([
-            "名称", "大小" ,"修改日期和时间","类型和权限", "硬链接数", "所有者", "所有组"
-        ])
+        self.model = RemoteTreeModel(self.load_remote_entries, file_type, self)
+        self.model.load_failed.connect(self.on_remote_load_failed)
+        # 排序和名称筛选都在本地完成，不重新请求列表
+        self.remote_proxy = RemoteFilterProxyModel(self)
+        self.remote_proxy.setSourceModel(self.model)
+        self.remote_view.setModel(self.remote_proxy)
+        self.remote_view.setUniformRowHeights(True)  # 行高一致，视图只需布局可见行
+        self.remote_view.setExpandsOnDoubleClick(False)  # 双击用于进入目录，展开用箭头
+        self.remote_view.header().setSortIndicator(0, Qt.AscendingOrder)
         self.remote_view.setSortingEnabled(True)  # 启用排序功能
 
+        # 远程文件名筛选框，输入时即时筛选
+        self.remote_filter_input = QLineEdit(self)
+        self.remote_filter_input.setPlaceholderText("筛选远程文件（支持 * ? 通配符）")
+        self.remote_filter_input.textChanged.connect(self.remote_proxy.set_name_filter)
+        remote_layout = QVBoxLayout()
+        remote_layout.setContentsMargins(0, 0, 0, 0)
+        remote_layout.addWidget(self.remote_filter_input)
+        remote_layout.addWidget(self.remote_view)
+        remote_panel = QWidget()
+        remote_panel.setLayout(remote_layout)
+
         splitter = QSplitter(Qt.Horizontal)
         splitter.addWidget(self.local_view)
-        splitter.addWidget(self.remote_view)
+        splitter.addWidget(remote_panel)
         splitter.setFixedHeight(500)
         
 
@@ -133,11 +1113,26 @@ class FTPClient(QWidget):
         # 状态栏
         self.status_bar = QStatusBar()
 
-        # 日志输出区域
-        self.log_output = QTextEdit(self)
-        self.log_output.setReadOnly(True)  # 日志只读
-        self.log_output.setStyleSheet("background-color: #f5f5f5;")  # 设置背景色
-        
+        # 日志输出区域：有上限的日志模型 + 只绘制可见行的列表视图
+        self.log_proxy = LogFilterProxyModel(self)
+        self.log_proxy.setSourceModel(self.log_model)
+        self.log_view = QListView(self)
+        self.log_view.setModel(self.log_proxy)
+        self.log_view.setUniformItemSizes(True)
+        self.log_view.setStyleSheet("background-color: #f5f5f5;")  # 设置背景色
+        self.log_proxy.rowsInserted.connect(self.on_log_rows_inserted)
+        self.log_level_combo = QComboBox(self)
+        self.log_level_combo.addItems(LOG_LEVELS)
+        self.log_level_combo.currentTextChanged.connect(self.log_proxy.set_min_level)
+        self.log_level_combo.setCurrentText("INFO")
+        self.export_log_button = QPushButton("导出日志", self)
+        self.export_log_button.clicked.connect(self.export_log)
+        log_bar = QHBoxLayout()
+        log_bar.addWidget(QLabel("日志级别: ", self))
+        log_bar.addWidget(self.log_level_combo)
+        log_bar.addStretch()
+        log_bar.addWidget(self.export_log_button)
+
 
         # 主布局
         main_layout = QVBoxLayout()
@@ -145,7 +1140,8 @@ class FTPClient(QWidget):
         main_layout.addLayout(search_layout)
         main_layout.addWidget(self.toolbar)
         main_layout.addWidget(splitter)
-        main_layout.addWidget(self.log_output)  # 添加日志区域
+        main_layout.addLayout(log_bar)
+        main_layout.addWidget(self.log_view)  # 添加日志区域
         main_layout.addWidget(self.status_bar)
 
         self.setLayout(main_layout)
@@ -159,12 +1155,14 @@ class FTPClient(QWidget):
 
         # 搜索按钮点击事件，搜索本地文件
         self.search_button.clicked.connect(self.search_local_files)
+        self.remote_search_button.clicked.connect(self.search_remote_files)
 
         # 表头点击事件，用于排序
         self.remote_view.header().sectionClicked.connect(self.sort_files)
 
         # 信号连接到状态栏更新函数
         self.connection_status_signal.connect(self.update_status_bar)
+        self.session_state_signal.connect(self.update_session_state)
 
         # 添加右键菜单
         self.remote_view.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -177,13 +1175,16 @@ class FTPClient(QWidget):
 
 
     def add_tool_actions(self):
-        upload_action = QAction(QIcon(resource_path('icons\\upload.png')), "上传", self)
+        upload_action = QAction("上传", self)
+        self.deferred_icons.append((upload_action, 'icons\\upload.png'))
         upload_action.triggered.connect(self.upload_file)
 
-        download_action = QAction(QIcon(resource_path('icons\\download.png')), "下载", self)
+        download_action = QAction("下载", self)
+        self.deferred_icons.append((download_action, 'icons\\download.png'))
         download_action.triggered.connect(self.download_file)
 
-        refresh_action = QAction(QIcon(resource_path('icons\\refresh.png')), "刷新", self)
+        refresh_action = QAction("刷新", self)
+        self.deferred_icons.append((refresh_action, 'icons\\refresh.png'))
         refresh_action.triggered.connect(self.refresh_remote_files)
 
 
@@ -192,12 +1193,14 @@ class FTPClient(QWidget):
         self.toolbar.addAction(refresh_action)
         
 
-        # 在工具栏中添加记录日志的操作
-        log_action = QAction(QIcon(resource_path('icons\\log.png')), '查看日志', self)
-        log_action.triggered.connect(self.show_log)
+        # 在工具栏中添加导出日志的操作
+        log_action = QAction('导出日志', self)
+        self.deferred_icons.append((log_action, 'icons\\log.png'))
+        log_action.triggered.connect(self.export_log)
         self.toolbar.addAction(log_action)
 
-        return_action=QAction(QIcon(resource_path('icons\\return.png')), '返回上一级', self)
+        return_action = QAction('返回上一级', self)
+        self.deferred_icons.append((return_action, 'icons\\return.png'))
         return_action.triggered.connect(self.navigate_to_parent_directory)
         self.toolbar.addAction(return_action)
 
@@ -217,13 +1220,31 @@ class FTPClient(QWidget):
 
     def update_status_bar(self, message):
         self.status_bar.showMessage(message)
-        self.log(message)  # 在日志中记录状态更新
+        self.log(message, "ERROR" if "失败" in message else "INFO")  # 在日志中记录状态更新
+
+    def update_session_state(self, connected, message):
+        self.is_connected = connected
+        self.connection_status_signal.emit(message)
 
-    def log(self, message):
-        # 日志消息格式化，添加时间戳
-        log_message = f"[{QDateTime.currentDateTime().toString('yyyy-MM-dd HH:mm:ss')}] {message}"
-        self.log_output.append(log_message)
-        print(log_message)  # 在控制台输出日志（可选）
+    def log(self, message, level="INFO"):
+        # 可在任意线程调用，消息由日志模型按批写入视图
+        self.log_model.append(message, level)
+
+    def on_log_rows_inserted(self):
+        # 只有视图停在底部时才跟随新日志滚动，查看历史时不打扰
+        bar = self.log_view.verticalScrollBar()
+        if bar.value() >= bar.maximum():
+            QTimer.singleShot(0, self.log_view.scrollToBottom)
+
+    def export_log(self):
+        path = QFileDialog.getSaveFileName(self, "导出日志", "ftp_client.log", "日志文件 (*.log *.txt)")[0]
+        if not path:
+            return
+        try:
+            self.log_model.export(path)
+            self.connection_status_signal.emit(f"日志已导出到 {path}")
+        except OSError as e:
+            self.connection_status_signal.emit(f"导出日志失败: {e}")
 
     def get_stylesheet(self):
         return """
@@ -246,7 +1267,7 @@ class FTPClient(QWidget):
             background-color: #f0f0f0;
             border-top: 10px solid #ccc;
         }
-        QTextEdit {
+        QListView {
             border: 1px solid #ccc;
             background-color: #f5f5f5;
         }
@@ -264,26 +1285,34 @@ class FTPClient(QWidget):
             password = "anonymous@"
 
         try:
-            self.backend_ftp_client = BackendFTPClient(host, port)
+            from ftp_client import FTPClient as BackendFTPClient
+
+            self.backend_ftp_client = BackendFTPClient(host, port, tls=self.tls_checkbox.isChecked())
             self.backend_ftp_client.login(username, password)
+            self.backend_ftp_client.on_state_change = self.session_state_signal.emit
+            self.backend_ftp_client.start_keepalive()
             self.connection_status_signal.emit("连接成功")
             self.is_connected = True
             self.refresh_remote_files()
             self.log(f"连接到FTP服务器 {host}:{port} 成功。")  # 记录连接成功日志
+            self.log(f"传输参数: {self.backend_ftp_client.tuning_report()}", "DEBUG")
         except Exception as e:
             self.connection_status_signal.emit(f"连接失败: {str(e)}")
-            self.log(f"连接失败: {str(e)}")  # 记录连接失败日志
+            self.log(f"连接失败: {str(e)}", "ERROR")  # 记录连接失败日志
 
 
 
     def quit_ftp(self):
         try:
             self.backend_ftp_client.quit()
+            self.is_connected = False
             self.model.clear()
+            self.remote_listing_dir = None
+            self.remote_listing_cache = {}
             self.log(f"断开FTP服务器成功。")  # 记录断开成功日志
         except Exception as e:
             self.connection_status_signal.emit(f"断开失败: {str(e)}")
-            self.log(f"断开失败: {str(e)}")  # 记录断开失败日志
+            self.log(f"断开失败: {str(e)}", "ERROR")  # 记录断开失败日志
 
 
     def refresh_remote_files(self):
@@ -291,41 +1320,33 @@ class FTPClient(QWidget):
             try:
                 # 从后端FTP客户端获取远程文件列表数据
                 raw_data = self.backend_ftp_client.list_content()
-                # 检查返回的数据是否为None或空字符串
+                # 检查返回的数据是否为None或空字符串（空目录同样需要更新视图）
                 if raw_data is None or raw_data.strip() == '':
-                    self.log("从FTP服务器接收到的数据为空。")
+                    self.log("从FTP服务器接收到的数据为空。", "WARNING")
                     self.connection_status_signal.emit("从FTP服务器接收到的数据为空。")
-                    return
-
-                # 清空当前模型以准备更新
-                self.model.clear()
-                self.model.setHorizontalHeaderLabels([
-            "名称", "大小" ,"修改日期和时间","类型和权限", "硬链接数", "所有者", "所有组"
-        ])
-                # 解析每行数据
+                    raw_data = raw_data or ""
+
                 lines = raw_data.splitlines()
-                self.parse_ftp_list_line(lines[0])
-                for line in lines:
-                    file_info = self.parse_ftp_list_line(line)
-                    if file_info:
-                        # 使用文件信息创建QStandardItem并添加到模型
-                        permissions, num_links, owner, group, size, mod_time_str, name = file_info
-                        name_item = QStandardItem(name)
-                        mod_time = QDateTime.fromString(f"{mod_time_str} {QDateTime.currentDateTime().toString('yyyy')}", '/MMM/dd HH:mm')
-                        permissions_item = QStandardItem(permissions)
-                        permissions_item = QStandardItem(f"File Folder") if permissions_item.text().startswith('d') else QStandardItem(f"{self.get_file_type(name)}")
-                        num_links_item = QStandardItem(str(num_links))
-                        owner_item = QStandardItem(owner)
-                        group_item = QStandardItem(group)
-                        size_item = QStandardItem(f"{size} B") if size!=4096 else QStandardItem(str(size))
-                        mod_time_item = QStandardItem(mod_time_str)
-
-                        # 根据权限字段的开头判断是文件还是文件夹，并设置相应图标
-                        icon = QIcon(resource_path('icons\\folder.png')) if permissions.startswith('d') else QIcon(resource_path('icons\\file.png'))
-                        name_item.setIcon(icon)
-
-                        # 将文件信息作为一行添加到模型
-                        self.model.appendRow([name_item, size_item, mod_time_item,permissions_item,num_links_item, owner_item, group_item])
+                new_lines = set(lines)
+                current_dir = self.backend_ftp_client.cwd
+                if current_dir:
+                    self.remote_listing_cache[current_dir] = raw_data
+                if current_dir != self.remote_listing_dir:
+                    # 切换了目录：整体重建模型。模型按批次向视图暴露行，
+                    # 图标和类型在行可见时才计算
+                    self.model.set_entries(self.parse_ftp_listing(raw_data))
+                else:
+                    # 同一目录：只解析变化的行，并把差异应用到模型
+                    old_lines = self.remote_listing_lines
+                    removed_names = [
+                        e[6] for e in self.parse_ftp_lines(old_lines - new_lines)
+                    ]
+                    changed_entries = self.parse_ftp_lines(
+                        line for line in lines if line not in old_lines
+                    )
+                    self.model.update_entries(removed_names, changed_entries)
+                self.remote_listing_dir = current_dir
+                self.remote_listing_lines = new_lines
 
                 self.connection_status_signal.emit("远程文件列表刷新成功。")
                 self.log("远程文件列表刷新成功。")
@@ -334,38 +1355,35 @@ class FTPClient(QWidget):
                 # 记录异常信息
                 error_message = f"刷新远程文件失败: {str(e)}"
                 self.connection_status_signal.emit(error_message)
-                self.log(error_message)
+                self.log(error_message, "ERROR")
                 # 如果可能，打印异常的堆栈跟踪
                 import traceback
-                self.log(traceback.format_exc())
-
-
-
-    def parse_ftp_list_line(self,line):  
-    # 解析从FTP服务器接收到的单行文件列表信息  
-        parts = line.split() 
-        if len(parts) < 9:  
-            return None  # 跳过格式不正确的行  
-        permissions = parts[0]  
-        num_links = int(parts[1])  
-        owner = parts[2]  
-        group = parts[3]  
-        size = int(parts[4])  
-        month= parts[5]  # 月份和日期可能在一起  
-        day= parts[6]  # 时间  
-        time=parts[7]
-        name = ' '.join(parts[8:])  # 文件名可能是多个单词  
-        month=self.convert_month_to_number(month)
-        # 格式化时间戳  
-        mod_time_str = f"2024/{month}/{day} {time}"  
-        return permissions, num_links, owner, group, size, mod_time_str, name
+                self.log(traceback.format_exc(), "DEBUG")
+
+
+
+    def load_remote_entries(self, path):
+        # 展开子目录时由模型调用
+        raw_data = self.backend_ftp_client.list_content(path) or ""
+        if self.backend_ftp_client.cwd:
+            self.remote_listing_cache[posixpath.join(self.backend_ftp_client.cwd, path)] = raw_data
+        return self.parse_ftp_listing(raw_data)
+
+    def on_remote_load_failed(self, path, message):
+        self.connection_status_signal.emit(f"获取目录 {path} 列表失败: {message}")
+
+    def parse_ftp_listing(self, raw_data):
+        # 整个列表一次解析，格式不正确的行被跳过
+        return parse_listing(raw_data)
+
+    def parse_ftp_lines(self, lines):
+        return parse_listing("\n".join(lines))
 
     
     def upload_file(self):
         if self.backend_ftp_client and self.is_connected:
             local_file_path = QFileDialog.getOpenFileName(self, "选择要上传的文件")[0]
             if local_file_path:
-                print(local_file_path)
                 file_name = os.path.basename(local_file_path)
                 try:
                     self.backend_ftp_client.upload(local_file_path, file_name)
@@ -377,66 +1395,115 @@ class FTPClient(QWidget):
         
 
     def download_file(self):
-        if self.backend_ftp_client and self.is_connected:
-            # 获取远程视图中选中的文件
-            selected_indexes = self.remote_view.selectedIndexes()
-            if not selected_indexes:
-                # 如果没有选中的远程文件，显示提示信息并返回
-                QMessageBox.information(self, "提示", "请在远程文件列表中选择一个文件。")
-                return
+        if not (self.backend_ftp_client and self.is_connected):
+            return
+        # 获取远程视图中选中的文件
+        selected_indexes = self.remote_view.selectedIndexes()
+        if not selected_indexes:
+            # 如果没有选中的远程文件，显示提示信息并返回
+            QMessageBox.information(self, "提示", "请在远程文件列表中选择一个文件。")
+            return
 
-            # 获取远程文件名
-            name_item = self.model.itemFromIndex(selected_indexes[0])
-            remote_file_name = name_item.text()
+        # 获取远程文件路径（展开的子目录中的条目带有相对路径）
+        selected_index = self.remote_proxy.mapToSource(selected_indexes[0])
+        remote_file_name = self.model.entry_path(selected_index)
+        remote_is_dir = self.model.entry_is_dir(selected_index)
 
-            # 使用QFileDialog弹出保存文件的对话框
-            save_path = QFileDialog.getSaveFileName(self, "选择保存位置", remote_file_name)
-            if not save_path[0]:  # 用户取消操作或未输入文件名
-             return
+        # 使用QFileDialog弹出保存文件的对话框
+        save_path = QFileDialog.getSaveFileName(
+            self, "选择保存位置", self.model.entry_name(selected_index)
+        )
+        if not save_path[0]:  # 用户取消操作或未输入文件名
+            return
 
-            # save_path[0] 已经是用户选择的完整本地路径（包括文件名和扩展名）
-            local_file_name = save_path[0]
+        # save_path[0] 已经是用户选择的完整本地路径（包括文件名和扩展名）
+        local_file_name = save_path[0]
 
         try:
-                # 执行下载操作，传入远程文件名和本地文件名
-                print(remote_file_name)
-                print("hello world")
-                self.backend_ftp_client.download(remote_file_name, local_file_name)
-                self.connection_status_signal.emit(f"下载成功: {remote_file_name}")
-                self.refresh_remote_files()# 下载成功后刷新远程文件列表
-                self.log(f"文件 '{remote_file_name}' 下载成功，保存为 '{local_file_name}'")
+            # 执行下载操作，传入远程文件名和本地文件名
+            self.backend_ftp_client.download(
+                remote_file_name, local_file_name, is_dir=remote_is_dir
+            )
+            self.connection_status_signal.emit(f"下载成功: {remote_file_name}")
+            self.refresh_remote_files()# 下载成功后刷新远程文件列表
+            self.log(f"文件 '{remote_file_name}' 下载成功，保存为 '{local_file_name}'")
         except Exception as e:
-                error_message = f"下载失败: {str(e)}"
-                self.connection_status_signal.emit(error_message)
-                self.log(error_message)
-                # 显示错误信息
-                QMessageBox.critical(self, "下载失败", f"文件 '{remote_file_name}' 下载失败。\n错误: {error_message}")
+            error_message = f"下载失败: {str(e)}"
+            self.connection_status_signal.emit(error_message)
+            self.log(error_message, "ERROR")
+            # 显示错误信息
+            QMessageBox.critical(self, "下载失败", f"文件 '{remote_file_name}' 下载失败。\n错误: {error_message}")
 
 
 
     def search_local_files(self):
-            search_text = self.search_input.text().strip()
-            if search_text:
-                root_index = self.local_model.index(QDir.rootPath())
-                self.local_view.setRootIndex(root_index)
-                for row in range(self.local_model.rowCount(root_index)):
-                    index = self.local_model.index(row, 0, root_index)
-                    file_name = self.local_model.fileName(index)
-                    if search_text.lower() in file_name.lower():
-                        self.local_view.setCurrentIndex(index)
-                        self.local_view.scrollTo(index)
-                        self.log(f"本地文件搜索匹配成功: {file_name}")  # 记录搜索日志
-                        break
-                else:
-                    QMessageBox.information(self, "提示", "未找到匹配的本地文件。")
-                    self.log("本地文件搜索无匹配项。")  # 记录无匹配日志
+        # 在本地面板当前选中的目录（未选中时为主目录）下递归搜索
+        from local_index import LocalIndex
+
+        root = self.local_search_root()
+        if self.local_index is None or self.local_index.root != root:
+            self.local_index = LocalIndex(root)
+        dialog = LocalSearchDialog(self.local_index, self.search_input.text().strip(), self)
+        dialog.open_result.connect(self.open_local_search_result)
+        dialog.show()
+
+    def local_search_root(self):
+        return self.current_local_dir() or os.path.abspath(QDir.homePath())
+
+    def current_local_dir(self):
+        # 本地面板当前选中的目录；选中的是文件时取其所在目录
+        index = self.local_view.currentIndex()
+        if not index.isValid():
+            return None
+        path = self.local_model.filePath(index)
+        if not self.local_model.isDir(index):
+            path = os.path.dirname(path)
+        return os.path.abspath(path)
+
+    def open_local_search_result(self, path):
+        # 在本地面板中展开到结果所在目录并选中该条目
+        index = self.local_model.index(path)
+        if not index.isValid():
+            self.log(f"本地文件已不存在: {path}", "WARNING")
+            return
+        self.local_view.setCurrentIndex(index)
+        self.local_view.scrollTo(index)
+        self.log(f"定位本地文件: {path}", "DEBUG")
 
+    def search_remote_files(self):
+        if not (self.backend_ftp_client and self.is_connected):
+            return
+        dialog = RemoteSearchDialog(
+            self.backend_ftp_client,
+            self.backend_ftp_client.cwd or "/",
+            self.remote_listing_cache,
+            self.search_input.text().strip(),
+            self,
+        )
+        dialog.open_result.connect(self.open_remote_search_result)
+        dialog.show()
+
+    def open_remote_search_result(self, path):
+        # 切换到结果所在目录并选中该条目
+        try:
+            self.backend_ftp_client.change_dir(posixpath.dirname(path) or "/")
+        except Exception as e:
+            self.connection_status_signal.emit(f"切换目录失败：{str(e)}")
+            return
+        self.refresh_remote_files()
+        row = self.model.root.row_index().get(posixpath.basename(path))
+        if row is None:
+            return
+        if row >= self.model.root.fetched:
+            self.model.fetch_all()
+        index = self.remote_proxy.mapFromSource(self.model.index(row, 0))
+        self.remote_view.setCurrentIndex(index)
+        self.remote_view.scrollTo(index)
+        self.log(f"已定位远程搜索结果：{path}")
 
     def sort_files(self, logicalIndex):
-        if self.remote_files_info:
-            self.remote_files_info.sort(key=lambda x: x[logicalIndex])
-            self.refresh_remote_files()
-            self.log("远程文件排序成功。")  # 记录排序日志
+        # 排序由视图调用模型在本地完成，这里只记录日志
+        self.log("远程文件排序成功。", "DEBUG")  # 记录排序日志
 
     def open_context_menu(self, position):
      if self.is_connected:
@@ -457,19 +1524,23 @@ class FTPClient(QWidget):
                 # 获取选中的远程文件路径
                 selected_indexes = self.remote_view.selectedIndexes()
                 if selected_indexes:
-                    name_item = self.model.itemFromIndex(selected_indexes[0])
-                    file_name = name_item.text()
+                    selected_index = self.remote_proxy.mapToSource(selected_indexes[0])
+                    file_name = self.model.entry_path(selected_index)
                     # 弹出文件选择对话框让用户选择保存位置
                     save_path = QFileDialog.getSaveFileName(self, "选择保存位置", file_name)[0]
                     if save_path:
                         try:
-                            self.backend_ftp_client.download(file_name, file_name)
+                            self.backend_ftp_client.download(
+                                file_name,
+                                save_path,
+                                is_dir=self.model.entry_is_dir(selected_index),
+                            )
                             self.connection_status_signal.emit(f"下载成功: {file_name}")
                             self.log(f"文件下载成功: {file_name}")  # 记录下载日志
                         except Exception as e:
                             error_message = f"下载失败: {str(e)}"
                             self.connection_status_signal.emit(error_message)
-                            self.log(error_message)  # 记录下载失败日志
+                            self.log(error_message, "ERROR")  # 记录下载失败日志
             elif action == binary_action:
                 self.backend_ftp_client.set_transfer_mode("binary")
                 self.log("传输模式设置为二进制。")  # 记录传输模式日志
@@ -519,7 +1590,7 @@ class FTPClient(QWidget):
                             except Exception as e:
                                 error_message = f"上传失败: {str(e)}"
                                 self.connection_status_signal.emit(error_message)
-                                self.log(error_message)  # 记录上传失败日志
+                                self.log(error_message, "ERROR")  # 记录上传失败日志
                 elif action == binary_action:
                     self.backend_ftp_client.set_transfer_mode("binary")
                     self.log("传输模式设置为二进制。")  # 记录传输模式日志
@@ -540,16 +1611,12 @@ class FTPClient(QWidget):
 
 
 
-    def show_log(self):
-        # 显示日志窗口
-        log_dialog = QMessageBox(self)
-        log_dialog.setWindowTitle("操作日志")
-        log_dialog.setText("\n".join(self.log_output.toPlainText().splitlines()))
-        log_dialog.exec_()
-
     def closeEvent(self, event):
         if self.backend_ftp_client and self.is_connected:
             self.backend_ftp_client.quit()
+        local_dir = self.current_local_dir()
+        if local_dir:
+            QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION).setValue("local/last_dir", local_dir)
         event.accept()
     
 
@@ -557,36 +1624,20 @@ class FTPClient(QWidget):
         if not self.is_connected:
             return
 
-        try:
-            # 假设 self.backend_ftp_client.list_content() 返回当前目录的文件列表
-            raw_data = self.backend_ftp_client.list_content()
-            lines = raw_data.splitlines()
-            index = index.row()  # 从 QModelIndex 中提取行索引
-            # 获取双击的文件对应的行
-            double_clicked_line = lines[index]
-            file_info = self.parse_ftp_list_line(double_clicked_line)
-            if file_info:
-                permissions, num_links, owner, group, size, mod_time_str, name = file_info
-                permissions_item = QStandardItem(permissions)
-                name_item = QStandardItem(name)
-
-                # 检查权限字段的第一个字符是否是 'd'
-                if permissions_item.text().startswith('d'):
-                    directory_name = name_item.text()  # 获取目录名称
-                    try:
-                        # 使用后端方法切换到远程目录
-                        self.backend_ftp_client.change_dir(directory_name)
-                        # 刷新视图以显示新目录的内容
-                        self.refresh_remote_files()
-                        self.log(f"成功切换到远程目录：{directory_name}")
-                    except Exception as e:
-                        # 处理切换目录时的异常
-                        self.log(f"切换目录失败：{str(e)}")
-                        self.connection_status_signal.emit(f"切换目录失败：{str(e)}")
-        except Exception as e:
-            # 处理获取文件列表时的异常
-            self.log(f"获取文件列表失败：{str(e)}")
-            self.connection_status_signal.emit(f"获取文件列表失败：{str(e)}")
+        # 条目信息直接取自模型，无需重新向服务器请求列表
+        index = self.remote_proxy.mapToSource(index)
+        if self.model.entry_is_dir(index):
+            directory_name = self.model.entry_path(index)  # 获取目录路径
+            try:
+                # 使用后端方法切换到远程目录
+                self.backend_ftp_client.change_dir(directory_name)
+                # 刷新视图以显示新目录的内容
+                self.refresh_remote_files()
+                self.log(f"成功切换到远程目录：{directory_name}")
+            except Exception as e:
+                # 处理切换目录时的异常
+                self.log(f"切换目录失败：{str(e)}", "ERROR")
+                self.connection_status_signal.emit(f"切换目录失败：{str(e)}")
 
     def show_upload_dialog(self, position=None):
         # 弹出文件选择对话框让用户选择要上传的文件
@@ -602,7 +1653,7 @@ class FTPClient(QWidget):
             except Exception as e:
                 error_message = f"上传失败: {str(e)}"
                 self.connection_status_signal.emit(error_message)
-                self.log(error_message)  # 记录上传失败日志
+                self.log(error_message, "ERROR")  # 记录上传失败日志
 
     def navigate_to_parent_directory(self):
         if not self.is_connected:
@@ -612,14 +1663,6 @@ class FTPClient(QWidget):
         self.refresh_remote_files()
         self.log("已返回上一级目录。")
 
-    def convert_month_to_number(self,month_name):
-        month_name = month_name.title()  # 确保输入的月份名称首字母大写
-        for month_num, month_abbr in enumerate(calendar.month_abbr[1:], 1):
-            if month_abbr == month_name:
-                return month_num
-        raise ValueError(f"无效的月份名称: {month_name}")
-    
-
     if getattr(sys, 'frozen', False):
     # If the application is run as a bundle, the PyInstaller bootloader
     # extends the sys module by a flag frozen=True and sets the app 
@@ -628,60 +1671,13 @@ class FTPClient(QWidget):
     else:
         application_path = os.path.dirname(os.path.abspath(__file__))
 
-    def get_file_type(self,name):
-            file_types = {
-                'txt': 'Text File',
-        'pdf': 'PDF Document',
-        'docx': 'Word Document',
-        'xlsx': 'Excel Spreadsheet',
-        'pptx': 'PowerPoint Presentation',
-        'jpg': 'JPEG Image',
-        'jpeg': 'JPEG Image',
-        'png': 'PNG Image',
-        'gif': 'GIF Image',
-        'bmp': 'Bitmap Image',
-        'tiff': 'TIFF Image',
-        'svg': 'Scalable Vector Graphics',
-        'log': 'Log File',
-        'xml': 'XML File',
-        'html': 'HTML Document',
-        'css': 'CSS File',
-        'js': 'JavaScript File',
-        'json': 'JSON File',
-        'zip': 'ZIP Archive',
-        'rar': 'RAR Archive',
-        '7z': '7z Archive',
-        'tar': 'TAR Archive',
-        'wav': 'WAV Audio',
-        'mp3': 'MP3 Audio',
-        'avi': 'AVI Video',
-        'mp4': 'MP4 Video',
-        'mov': 'QuickTime Video',
-        'exe': 'Executable File',
-        'dll': 'Dynamic Link Library',
-        'iso': 'ISO Disk Image',
-        'bak': 'Backup File',
-        'sln': 'Solution File',
-        'csv': 'Comma-Separated Values',
-        'yml': 'YAML File',
-        'py': 'Python Script',
-        'c': 'C Source File',
-        'md': 'Markdown Document',
-        'sh': 'Shell Script',
-        'gdb': 'GDB Script',
-        'h': 'C/C++ Header File',
-        'S': 'Assembly Source File',
-                # 可以继续添加更多的文件类型和扩展名
-            }
-            
-            name_item = QStandardItem(name)
-            name = name_item.text()
-            # 然后获取文件的扩展名
-            extension = (name.split('.')[-1] if '.' in name else 'unknown').lower()
-            return file_types.get(extension, 'Unknown File Type')
+
+startup_mark("导入模块")
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    startup_mark("初始化 Qt")
     client = FTPClient()
     client.show()
     sys.exit(app.exec_())
@@ -0,0 +1,149 @@
+import re
+from datetime import datetime, timedelta
+
+# 目录列表解析。parse_listing() 一次处理整个 LIST/STAT 文本，用预编译的正则在 C 层
+# 切出所有字段，Python 层只做类型转换。每个条目是一个元组：
+#   (权限, 硬链接数, 所有者, 所有组, 大小, 修改时间, 名称, 链接目标)
+# 修改时间为 "YYYY/MM/DD HH:MM"，只有年份的旧文件为 "YYYY/MM/DD"，补零后按字符串排序
+# 即按时间排序。链接目标只有符号链接才有，其他为 None。无法识别的行（如 "total 12"）跳过。
+# 支持的格式：
+#   Unix "ls -l"：  -rw-r--r--   1 owner group  1234 Jan  5 10:00 name
+#                  也接受缺少所有组的列和 long-iso 日期（2024-01-05 10:00）
+#   DOS/IIS：      01-05-24  10:00AM       <DIR>          name
+
+_MONTHS = {}
+for _number, _name in enumerate(
+    ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1
+):
+    _MONTHS[_name] = _MONTHS[_name.lower()] = _MONTHS[_name.upper()] = _number
+
+_UNIX_LINE = re.compile(
+    r"^([-bcdlpsDw?][-\w?]{9}[.+@]?) +(\d+) +(\S+) +(?:(\S+) +)?(\d+) +"
+    r"([A-Za-z]{3} +\d{1,2} +(?:\d{1,2}:\d{2}|\d{4})|\d{4}-\d{2}-\d{2} +\d{2}:\d{2}) ([^\r\n]*)",
+    re.MULTILINE,
+)
+
+_DOS_LINE = re.compile(
+    r"^(\d{2}-\d{2}-(?:\d{4}|\d{2}) +\d{1,2}:\d{2}(?:[AaPp][Mm])?) +(<DIR>|\d+) +([^\r\n]*)",
+    re.MULTILINE,
+)
+
+_DOS_DIR = "d---------"
+_DOS_FILE = "----------"
+
+
+class _UnixDates(dict):
+    # 原始日期文本 -> 规范化的修改时间。同一列表中日期大量重复，每种只换算一次；
+    # 不同的时刻也多落在少数几天，所以"月 日"部分另外缓存，未命中时只需拼接字符串。
+    # 带时:分的条目不显示年份，属于最近半年：取当前年份，若因此落在明天之后则是去年
+    # （留一天余量给服务器时钟和时区的偏差）
+
+    def __init__(self, now: datetime | None):
+        super().__init__()
+        now = now or datetime.now()
+        self.year = now.year
+        limit = now + timedelta(days=1)
+        self.limit = (limit.year, limit.month, limit.day)
+        self.days = {}  # "Jan  5" -> ("2026/01/05", "/01/05")，无法识别的月份为 None
+        self.invalid = False  # 是否出现过无法识别的月份
+
+    def __missing__(self, raw: str):
+        if raw[4] == "-":  # long-iso：2024-01-05 10:00
+            value = raw[:10].replace("-", "/") + " " + raw.split()[1]
+        else:
+            month_day, _, token = raw.rpartition(" ")
+            day = self.days.get(month_day, False)
+            if day is False:
+                day = self.days[month_day] = self.convert_day(month_day)
+            if day is None:
+                self.invalid = True
+                value = None
+            elif ":" in token:
+                value = day[0] + (" " + token if len(token) == 5 else " 0" + token)
+            else:
+                value = token + day[1]
+        self[raw] = value
+        return value
+
+    def convert_day(self, month_day: str):
+        name, day = month_day.split()
+        month = _MONTHS.get(name)
+        if month is None:
+            return None
+        day = int(day)
+        year = self.year
+        if (year, month, day) > self.limit:
+            year -= 1
+        suffix = f"/{month:02d}/{day:02d}"
+        return f"{year:04d}{suffix}", suffix
+
+
+class _DosDates(dict):
+    # "MM-DD-YY  HH:MMAM" -> 规范化的修改时间；两位年份 70 以下算 20xx
+
+    def __missing__(self, raw: str):
+        date_part, time_part = raw.split()
+        month, day, year = (int(x) for x in date_part.split("-"))
+        if year < 100:
+            year += 2000 if year < 70 else 1900
+        suffix = time_part[-2:].upper()
+        if suffix in ("AM", "PM"):
+            time_part = time_part[:-2]
+        hour, minute = time_part.split(":")
+        hour = int(hour)
+        if suffix == "PM" and hour < 12:
+            hour += 12
+        elif suffix == "AM" and hour == 12:
+            hour = 0
+        value = self[raw] = f"{year:04d}/{month:02d}/{day:02d} {hour:02d}:{minute}"
+        return value
+
+
+def parse_listing(text: str, now: datetime | None = None) -> list:
+    # 解析整个列表文本；now 用于推断最近条目的年份，默认为当前时间
+    matches = _UNIX_LINE.findall(text)
+    if matches:
+        return _unix_entries(matches, now)
+    matches = _DOS_LINE.findall(text)
+    if matches:
+        return _dos_entries(matches)
+    return []
+
+
+def _unix_entries(matches: list, now: datetime | None) -> list:
+    dates = _UnixDates(now)
+    entries = [
+        (permissions, int(links), owner, group, int(size), dates[date], name, None)
+        for permissions, links, owner, group, size, date, name in matches
+    ]
+    if dates.invalid:
+        entries = [entry for entry in entries if entry[5] is not None]
+    for i, entry in enumerate(entries):
+        if entry[0][0] == "l":
+            name, separator, target = entry[6].partition(" -> ")
+            if separator:
+                entries[i] = entry[:6] + (name, target)
+    return entries
+
+
+def _dos_entries(matches: list) -> list:
+    dates = _DosDates()
+    return [
+        (_DOS_DIR, 1, "", "", 0, dates[date], name, None)
+        if size == "<DIR>"
+        else (_DOS_FILE, 1, "", "", int(size), dates[date], name, None)
+        for date, size, name in matches
+    ]
+
+
+def parse_mod_time(mod_time_str: str) -> datetime:
+    # 把规范化的修改时间转换为 datetime，无法解析时返回 datetime.min
+    date_part, _, time_part = mod_time_str.partition(" ")
+    try:
+        year, month, day = (int(x) for x in date_part.split("/"))
+        if ":" in time_part:
+            hour, minute = (int(x) for x in time_part.split(":"))
+            return datetime(year, month, day, hour, minute)
+        return datetime(year, month, day)
+    except ValueError:
+        return datetime.min
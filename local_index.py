@@ -0,0 +1,189 @@
+import fnmatch
+import heapq
+import os
+import re
+import threading
+import time
+from bisect import bisect_right
+from itertools import accumulate
+
+# 本地文件索引。后台线程用 os.scandir 遍历 root 下的全部目录，查询直接在内存中完成。
+# 每个目录记录自身的修改时间和条目：refresh() 时只重新列出修改时间变化的目录
+# （在目录中增删、改名都会更新它的修改时间），未变化的目录沿用上次的条目，只需 stat 一次。
+# 查询使用不可变的快照，刷新完成后整体替换，查询期间无需加锁，也不会看到半成品。
+
+SEARCH_MODES = ("substring", "glob", "regex")
+
+
+class LocalIndex:
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.dirs = {}  # 目录路径 -> (修改时间, [(名称, 是否目录, 大小, 修改时间)])
+        self.snapshot = None
+        self.lock = threading.Lock()  # 同一时间只进行一次构建或刷新
+        self.errors = 0  # 最近一次扫描中无法列出的目录数
+        self.listed_dirs = 0  # 最近一次扫描中实际列出的目录数
+        self.scan_seconds = 0.0
+        self.updated_at = None
+
+    @property
+    def ready(self) -> bool:
+        return self.snapshot is not None
+
+    def refresh(self):
+        # 第一次调用时没有缓存的目录，即完整构建
+        with self.lock:
+            start = time.monotonic()
+            previous = self.dirs
+            dirs = {}
+            listed = errors = 0
+            stack = [self.root]
+            while stack:
+                path = stack.pop()
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    errors += 1
+                    continue
+                cached = previous.get(path)
+                if cached is not None and cached[0] == mtime:
+                    entries = cached[1]
+                else:
+                    entries = self._list_dir(path)
+                    if entries is None:
+                        errors += 1
+                        continue
+                    listed += 1
+                dirs[path] = (mtime, entries)
+                for name, is_dir, _, _ in entries:
+                    if is_dir:
+                        stack.append(os.path.join(path, name))
+            self.dirs = dirs
+            self.snapshot = _Snapshot(dirs)
+            self.errors = errors
+            self.listed_dirs = listed
+            self.scan_seconds = time.monotonic() - start
+            self.updated_at = time.time()
+
+    @staticmethod
+    def _list_dir(path: str) -> list | None:
+        entries = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        # 不跟随指向目录的符号链接，避免循环和重复
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    entries.append((entry.name, is_dir, 0 if is_dir else stat.st_size, stat.st_mtime))
+        except OSError:
+            return None
+        return entries
+
+    def search(self, query: str, mode: str = "substring", limit: int | None = 1000):
+        # 返回 (匹配总数, 排序后的前 limit 个结果)，结果为 (路径, 是否目录, 大小, 修改时间)。
+        # 名称匹配不区分大小写。子串：名称等于查询的排最前，其次是以它开头的，再其次是包含它的；
+        # 通配符和正则：完整匹配名称的排在只匹配一部分的前面。同级内浅层目录、短名称优先
+        snapshot = self.snapshot
+        if snapshot is None or not query:
+            return 0, []
+        if mode == "substring":
+            lowered = query.lower()
+            hits = snapshot.find_substring(lowered)
+            names = snapshot.lower_names
+
+            def rank(i):
+                name = names[i]
+                return 0 if name == lowered else 1 if name.startswith(lowered) else 2
+
+        elif mode in ("glob", "regex"):
+            if mode == "glob":
+                pattern = re.compile(fnmatch.translate(query), re.IGNORECASE)
+                search = pattern.match
+            else:
+                pattern = re.compile(query, re.IGNORECASE)
+                search = pattern.search
+            names = snapshot.names
+            hits = [i for i, name in enumerate(names) if search(name)]
+            fullmatch = pattern.fullmatch
+
+            def rank(i):
+                return 0 if fullmatch(names[i]) else 1
+
+        else:
+            raise Exception(f"Unknown search mode: {mode}")
+
+        depths = snapshot.depths
+        lengths = snapshot.name_lengths
+
+        def key(i):
+            return rank(i), depths[i], lengths[i], snapshot.lower_names[i]
+
+        if limit is None or len(hits) <= limit:
+            ordered = sorted(hits, key=key)
+        else:
+            ordered = heapq.nsmallest(limit, hits, key=key)
+        return len(hits), [snapshot.result(i) for i in ordered]
+
+
+class _Snapshot:
+    # 扁平化的只读索引。所有名称转小写后以换行拼接成一个字符串，子串查询用 str.find
+    # 在 C 层扫描，再用二分查找把偏移量映射回条目
+
+    def __init__(self, dirs: dict):
+        dir_paths = []
+        dir_depths = []
+        parents = []
+        names = []
+        is_dirs = []
+        sizes = []
+        mtimes = []
+        for path, (_, entries) in dirs.items():
+            parent = len(dir_paths)
+            dir_paths.append(path)
+            dir_depths.append(path.count(os.sep))
+            for name, is_dir, size, mtime in entries:
+                parents.append(parent)
+                names.append(name)
+                is_dirs.append(is_dir)
+                sizes.append(size)
+                mtimes.append(mtime)
+        self.dir_paths = dir_paths
+        self.parents = parents
+        self.names = names
+        self.is_dirs = is_dirs
+        self.sizes = sizes
+        self.mtimes = mtimes
+        self.depths = [dir_depths[parent] for parent in parents]
+        self.lower_names = [name.lower() for name in names]
+        self.name_lengths = [len(name) for name in names]
+        self.text = "\n".join(self.lower_names)
+        # 每个条目在 text 中的起始偏移。必须按小写后的长度计算：
+        # 有些字符小写后变长（如 "İ".lower() 为两个字符）
+        self.starts = [0]
+        self.starts.extend(accumulate(len(name) + 1 for name in self.lower_names))
+        self.starts.pop()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def find_substring(self, lowered: str) -> list:
+        text = self.text
+        starts = self.starts
+        count = len(starts)
+        hits = []
+        position = text.find(lowered)
+        while position != -1:
+            i = bisect_right(starts, position) - 1
+            hits.append(i)
+            if i + 1 >= count:
+                break
+            position = text.find(lowered, starts[i + 1])  # 同一名称只计一次
+        return hits
+
+    def result(self, i: int) -> tuple:
+        path = os.path.join(self.dir_paths[self.parents[i]], self.names[i])
+        return path, self.is_dirs[i], self.sizes[i], self.mtimes[i]
@@ -0,0 +1,151 @@
+# 测试用的最小 FTP 服务器，在后台线程中运行，根目录为本地的一个临时目录。
+# 只实现客户端测试用到的命令，行为可以通过属性调整：
+#   multiline_150  LIST 的 150 应答使用多行形式（pure-ftpd 风格）
+#   drop_after     第一次 RETR 发送这么多字节后断开数据连接和控制连接
+#   abor_delay     ABOR 的应答推迟这么多秒（模拟高延迟链路）
+import os
+import socket
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def send(self, message: str):
+        self.wfile.write((message + "\r\n").encode())
+        self.wfile.flush()
+
+    def local(self, path: str) -> str:
+        path = os.path.normpath(os.path.join(self.cwd, path)).lstrip("/")
+        return os.path.join(self.server.root, path)
+
+    def accept_data(self) -> socket.socket:
+        conn, _ = self.passive.accept()
+        self.passive.close()
+        self.passive = None
+        return conn
+
+    def handle(self):
+        server = self.server
+        self.cwd = "/"
+        self.passive = None
+        self.rest = 0
+        self.send("220 ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd, _, arg = line.decode().rstrip("\r\n").partition(" ")
+            cmd = cmd.upper()
+            server.commands.append(line.decode().rstrip("\r\n"))
+            if cmd == "USER":
+                self.send("331 password")
+            elif cmd == "PASS":
+                self.send("230 logged in")
+            elif cmd == "PWD":
+                self.send(f'257 "{self.cwd}"')
+            elif cmd == "CWD":
+                if os.path.isdir(self.local(arg)):
+                    self.cwd = os.path.normpath(os.path.join(self.cwd, arg))
+                    self.send("250 ok")
+                else:
+                    self.send("550 no such directory")
+            elif cmd in ("TYPE", "MODE", "NOOP"):
+                self.send("200 ok")
+            elif cmd == "PASV":
+                self.passive = socket.socket()
+                self.passive.bind(("127.0.0.1", 0))
+                self.passive.listen(1)
+                port = self.passive.getsockname()[1]
+                self.send(f"227 Entering Passive Mode (127,0,0,1,{port >> 8},{port & 255})")
+            elif cmd == "SIZE":
+                path = self.local(arg)
+                if os.path.isfile(path):
+                    self.send(f"213 {os.path.getsize(path)}")
+                else:
+                    self.send("550 no such file")
+            elif cmd == "REST":
+                self.rest = int(arg)
+                self.send(f"350 restarting at {self.rest}")
+            elif cmd == "LIST":
+                path = self.local(arg or ".")
+                names = sorted(os.listdir(path))
+                lines = [
+                    f"{'d' if os.path.isdir(os.path.join(path, n)) else '-'}rw-r--r-- 1 o g "
+                    f"{os.path.getsize(os.path.join(path, n))} Jan  1 2024 {n}"
+                    for n in names
+                ]
+                self.send("150-Opening data connection\r\n150 listing" if server.multiline_150 else "150 listing")
+                conn = self.accept_data()
+                conn.sendall("".join(line + "\r\n" for line in lines).encode())
+                conn.close()
+                self.send("226 done")
+            elif cmd == "RETR":
+                path = self.local(arg)
+                if not os.path.isfile(path):
+                    self.send("550 no such file")
+                    continue
+                self.send("150 opening")
+                conn = self.accept_data()
+                with open(path, "rb") as f:
+                    f.seek(self.rest)
+                    self.rest = 0
+                    data = f.read()
+                if server.drop_after is not None:
+                    conn.sendall(data[: server.drop_after])
+                    server.drop_after = None
+                    conn.close()
+                    return  # 连同控制连接一起断开
+                try:
+                    conn.sendall(data)
+                except OSError:
+                    conn.close()
+                    self.send("426 transfer aborted")  # 客户端提前关闭了数据连接
+                    continue
+                conn.close()
+                self.send("226 done")
+            elif cmd == "ABOR":
+                time.sleep(server.abor_delay)
+                self.send("226 ABOR ok")
+            elif cmd == "STOR":
+                self.send("150 send data")
+                conn = self.accept_data()
+                with open(self.local(arg), "r+b" if self.rest else "wb") as f:
+                    f.seek(self.rest)
+                    f.truncate()
+                    self.rest = 0
+                    while True:
+                        data = conn.recv(65536)
+                        if not data:
+                            break
+                        f.write(data)
+                conn.close()
+                self.send("226 stored")
+            elif cmd == "QUIT":
+                self.send("221 bye")
+                return
+            else:
+                self.send("502 not implemented")
+
+
+class FTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, root: str):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.root = str(root)
+        self.commands = []
+        self.multiline_150 = False
+        self.drop_after = None
+        self.abor_delay = 0.0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
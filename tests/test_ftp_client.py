@@ -0,0 +1,90 @@
+import hashlib
+
+import pytest
+
+from ftp_client import FTPClient, TransportConfig
+from ftp_server import FTPServer
+
+
+@pytest.fixture
+def server(tmp_path):
+    root = tmp_path / "root"
+    (root / "d").mkdir(parents=True)
+    (root / "a.txt").write_bytes(b"hello")
+    server = FTPServer(root)
+    yield server
+    server.close()
+
+
+def connect(server, **kwargs) -> FTPClient:
+    client = FTPClient("127.0.0.1", server.port, keepalive_interval=None, stat_listing=False, **kwargs)
+    client.login("user", "pass")
+    return client
+
+
+def test_multiline_150_does_not_desync_control_channel(server):
+    server.multiline_150 = True
+    client = connect(server)
+    listing = client.list_content()
+    assert "a.txt" in listing
+    client.change_dir("d")
+    assert client.cwd == "/d"
+
+
+def test_preallocated_download_resumes_after_disconnect(server, tmp_path):
+    data = bytes(range(256)) * 4096
+    (tmp_path / "root" / "big.bin").write_bytes(data)
+    server.drop_after = 300000
+    client = connect(server, transport=TransportConfig(preallocate=True))
+    target = tmp_path / "big.bin"
+    assert client.download("big.bin", str(target))
+    assert target.read_bytes() == data
+    assert not (tmp_path / "big.bin.part").exists()
+    assert "REST 300000" in server.commands
+
+
+def test_upload_digest_is_computed_only_when_verified(server, tmp_path, monkeypatch):
+    import ftp_client
+    from ftp_client import TransferJournal
+
+    source = tmp_path / "up.bin"
+    source.write_bytes(b"x" * 100000)
+    monkeypatch.setattr(ftp_client, "file_digest", None)  # 上传后不得重读整个文件
+    client = connect(server)
+    for verify in (False, True):
+        client.journal = TransferJournal(str(tmp_path / f"journal-{verify}.log"), verify_digests=verify)
+        assert client.upload(str(source), f"up-{verify}.bin")
+        record = client.journal.records[("put", str(source), f"up-{verify}.bin")]
+        assert record.get("sha256") == (hashlib.sha256(source.read_bytes()).hexdigest() if verify else None)
+        client.journal.close()
+
+
+def test_streams_use_binary_and_restore_the_previous_type(server):
+    client = connect(server)
+    with client.retr_stream("a.txt") as stream:
+        assert stream.read() == b"hello"
+    assert client.stor_stream("b.txt", [b"abc"]) == 3
+    types = [command for command in server.commands if command.startswith("TYPE")]
+    assert types == ["TYPE I", "TYPE A", "TYPE I", "TYPE A"]
+    assert client.transfer_mode == "ascii"
+
+
+def test_control_commands_are_refused_while_a_stream_is_open(server):
+    client = connect(server)
+    stream = client.retr_stream("a.txt")
+    with pytest.raises(Exception, match="retr_stream"):
+        client.change_dir("d")
+    assert stream.read() == b"hello"
+    stream.close()
+    client.change_dir("d")
+    assert client.cwd == "/d"
+
+
+def test_slow_abor_reply_is_read_before_the_next_command(server, tmp_path):
+    (tmp_path / "root" / "big.bin").write_bytes(b"x" * (16 * 1024 * 1024))
+    server.abor_delay = 1.0
+    client = connect(server)
+    with client.retr_stream("big.bin") as stream:
+        assert stream.read(5) == b"xxxxx"
+    client.change_dir("d")
+    assert client.cwd == "/d"
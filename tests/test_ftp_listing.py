@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from ftp_listing import parse_listing, parse_mod_time
+
+NOW = datetime(2026, 3, 10, 12, 0)
+
+
+def test_unix_listing():
+    text = (
+        "total 12\r\n"
+        "-rw-r--r--   1 owner group      1234 Jan  5 10:00 notes.txt\r\n"
+        "drwxr-xr-x   2 owner group      4096 Feb 28  2023 old dir\r\n"
+        "lrwxrwxrwx   1 owner group         7 Mar  1 09:05 link -> target\r\n"
+    )
+    assert parse_listing(text, NOW) == [
+        ("-rw-r--r--", 1, "owner", "group", 1234, "2026/01/05 10:00", "notes.txt", None),
+        ("drwxr-xr-x", 2, "owner", "group", 4096, "2023/02/28", "old dir", None),
+        ("lrwxrwxrwx", 1, "owner", "group", 7, "2026/03/01 09:05", "link", "target"),
+    ]
+
+
+def test_unix_name_keeps_leading_spaces_and_missing_group():
+    entries = parse_listing("-rw-r--r-- 1 owner 5 Jan  5 10:00  spaced\n", NOW)
+    assert entries == [("-rw-r--r--", 1, "owner", "", 5, "2026/01/05 10:00", " spaced", None)]
+
+
+def test_recent_entry_after_tomorrow_belongs_to_last_year():
+    entries = parse_listing(
+        "-rw-r--r-- 1 o g 1 Mar 11 1:00 tomorrow\n"
+        "-rw-r--r-- 1 o g 1 Mar 12 1:00 later\n",
+        NOW,
+    )
+    assert [entry[5] for entry in entries] == ["2026/03/11 01:00", "2025/03/12 01:00"]
+
+
+def test_long_iso_dates():
+    entries = parse_listing("-rw-r--r-- 1 o g 1 2024-01-05 10:00 iso\n", NOW)
+    assert entries[0][5] == "2024/01/05 10:00"
+
+
+def test_unknown_month_is_skipped():
+    entries = parse_listing(
+        "-rw-r--r-- 1 o g 1 Foo  5 10:00 bad\n"
+        "-rw-r--r-- 1 o g 1 Jan  5 10:00 good\n",
+        NOW,
+    )
+    assert [entry[6] for entry in entries] == ["good"]
+
+
+def test_dos_listing():
+    text = (
+        "01-05-24  10:00AM       <DIR>          folder\r\n"
+        "12-31-99  12:30PM                 42 file.txt\r\n"
+    )
+    assert parse_listing(text) == [
+        ("d---------", 1, "", "", 0, "2024/01/05 10:00", "folder", None),
+        ("----------", 1, "", "", 42, "1999/12/31 12:30", "file.txt", None),
+    ]
+
+
+def test_parse_mod_time():
+    assert parse_mod_time("2026/01/05 10:00") == datetime(2026, 1, 5, 10, 0)
+    assert parse_mod_time("2023/02/28") == datetime(2023, 2, 28)
+    assert parse_mod_time("garbage") == datetime.min
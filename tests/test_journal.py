@@ -0,0 +1,73 @@
+import json
+import os
+
+from ftp_client import TransferJournal, _tree_fingerprint
+
+
+def test_torn_last_line_does_not_swallow_next_record(tmp_path):
+    path = tmp_path / "journal.log"
+    first, second = tmp_path / "a", tmp_path / "b"
+    first.mkdir()
+    second.mkdir()
+    record = {"op": "done", "kind": "get-dir", "source": "/a", "target": str(first),
+              "tree": _tree_fingerprint(str(first))}
+    path.write_text(json.dumps(record) + '\n{"op": "done", "ki')
+    journal = TransferJournal(str(path))
+    journal.record_done("get-dir", "/b", str(second))
+    journal.close()
+
+    reloaded = TransferJournal(str(path))
+    assert reloaded.is_done("get-dir", "/a", str(first))
+    assert reloaded.is_done("get-dir", "/b", str(second))
+    reloaded.close()
+
+
+def test_put_is_redone_when_source_changes(tmp_path):
+    source = tmp_path / "data.bin"
+    source.write_bytes(b"12345")
+    journal = TransferJournal(str(tmp_path / "journal.log"))
+    journal.record_done("put", str(source), "/data.bin", size=5)
+    assert journal.is_done("put", str(source), "/data.bin")
+
+    source.write_bytes(b"54321")  # 大小不变，内容和修改时间变化
+    os.utime(source, ns=(0, 1))
+    assert not journal.is_done("put", str(source), "/data.bin")
+    source.unlink()
+    assert not journal.is_done("put", str(source), "/data.bin")
+    journal.close()
+
+
+def test_put_dir_is_redone_when_tree_changes(tmp_path):
+    tree = tmp_path / "tree"
+    os.makedirs(tree / "sub")
+    (tree / "sub" / "a.txt").write_text("a")
+    journal = TransferJournal(str(tmp_path / "journal.log"))
+    journal.record_done("put-dir", str(tree), "/tree")
+    assert journal.is_done("put-dir", str(tree), "/tree")
+
+    (tree / "sub" / "b.txt").write_text("b")
+    assert not journal.is_done("put-dir", str(tree), "/tree")
+    journal.close()
+
+
+def test_get_dir_is_redone_when_local_tree_changes(tmp_path):
+    tree = tmp_path / "tree"
+    os.makedirs(tree / "sub")
+    (tree / "sub" / "a.txt").write_text("a")
+    journal = TransferJournal(str(tmp_path / "journal.log"))
+    journal.record_done("get-dir", "/tree", str(tree))
+    assert journal.is_done("get-dir", "/tree", str(tree))
+
+    (tree / "sub" / "a.txt").unlink()
+    assert not journal.is_done("get-dir", "/tree", str(tree))
+    journal.close()
+
+
+def test_sync_accepts_read_only_files(tmp_path):
+    target = tmp_path / "data.bin"
+    target.write_bytes(b"12345")
+    target.chmod(0o444)
+    journal = TransferJournal(str(tmp_path / "journal.log"))
+    journal.record_done("get", "/data.bin", str(target), size=5, sync_path=str(target))
+    journal.close()
+    assert TransferJournal(str(tmp_path / "journal.log")).is_done("get", "/data.bin", str(target))
@@ -0,0 +1,57 @@
+import os
+import time
+
+from local_index import LocalIndex, _Snapshot
+
+
+def make_snapshot(names):
+    return _Snapshot({"/root": (0, [(name, False, len(name), 0.0) for name in names])})
+
+
+def test_find_substring_maps_offsets_to_entries():
+    snapshot = make_snapshot(["alpha.txt", "beta.txt", "gamma.txt"])
+    assert snapshot.find_substring("alpha") == [0]
+    assert snapshot.find_substring("beta") == [1]
+    assert snapshot.find_substring("gamma") == [2]
+    assert snapshot.find_substring(".txt") == [0, 1, 2]
+    assert snapshot.find_substring("missing") == []
+
+
+def test_find_substring_counts_each_name_once():
+    snapshot = make_snapshot(["aaaa", "b", "xaax"])
+    assert snapshot.find_substring("aa") == [0, 2]
+
+
+def test_find_substring_with_names_longer_when_lowercased():
+    # "İ".lower() 是两个字符，之后所有条目的偏移都依赖小写后的长度
+    assert len("İ".lower()) == 2
+    snapshot = make_snapshot(["İ" * 20 + ".txt", "alpha.txt", "beta.txt", "gamma.txt"])
+    assert snapshot.find_substring("alpha") == [1]
+    assert snapshot.find_substring("beta") == [2]
+    assert snapshot.find_substring("gamma") == [3]
+
+
+def test_search_ranks_and_refreshes_incrementally(tmp_path):
+    os.makedirs(tmp_path / "a" / "b")
+    (tmp_path / "a" / "b" / "report.txt").write_text("x")
+    (tmp_path / "a" / "old_report.txt").write_text("x")
+    (tmp_path / "Report").write_text("x")
+    index = LocalIndex(str(tmp_path))
+    index.refresh()
+
+    total, results = index.search("report")
+    assert total == 3
+    assert [os.path.relpath(r[0], tmp_path) for r in results] == [
+        "Report",
+        os.path.join("a", "b", "report.txt"),
+        os.path.join("a", "old_report.txt"),
+    ]
+    assert index.search("*.TXT", "glob")[0] == 2
+    assert index.search(r"^old_", "regex")[0] == 1
+
+    # 只有内容变化的目录会被重新列出
+    time.sleep(0.01)
+    (tmp_path / "a" / "b" / "new.log").write_text("x")
+    index.refresh()
+    assert index.listed_dirs == 1
+    assert index.search("new.log")[0] == 1